@@ -48,6 +48,9 @@ class COAsT:
         
         Args:
             file_or_dir (str)     : file name or directory to multiple files.
+                                    A glob pattern or list of file names
+                                    is always loaded as multiple files. An
+                                    opened xarray dataset is used directly.
             chunks (dict)  : Chunks to use in Dask [default None]
             multiple (bool): If true, load in multiple files from directory.
                              If false load a single file [default False]
@@ -61,7 +64,18 @@ class COAsT:
         return self.dataset[name]
 
     def load_single(self, file, chunks: dict = None):
-        """ Loads a single file into COAsT object's dataset variable. """
+        """ Loads a single file into COAsT object's dataset variable. If file
+        is a list of files or a glob pattern, these are loaded (in parallel,
+        chunked by dask) using load_multiple(). If file is an already opened
+        xarray dataset, a shallow copy of it is used, so the file need not
+        be decoded again. """
+        if isinstance(file, xr.Dataset):
+            self.load_dataset(file.copy())
+            return
+        if (isinstance(file, (list, tuple))
+                or (isinstance(file, str) and any(c in file for c in '*?['))):
+            self.load_multiple(file, chunks)
+            return
         info(f"Loading a single file ({file} for {get_slug(self)}")
         self.dataset = xr.open_dataset(file, chunks=chunks)
 
@@ -266,19 +280,20 @@ class COAsT:
 
         debug(f"Calculating haversine distance between {lon1},{lat1} and {lon2},{lat2}")
 
-        # Convert to radians for calculations
-        lon1 = xr.ufuncs.deg2rad(lon1)
-        lat1 = xr.ufuncs.deg2rad(lat1)
-        lon2 = xr.ufuncs.deg2rad(lon2)
-        lat2 = xr.ufuncs.deg2rad(lat2)
+        # Convert to radians for calculations. NumPy ufuncs dispatch on
+        # xarray/dask inputs, so lazy arrays stay lazy.
+        lon1 = np.deg2rad(lon1)
+        lat1 = np.deg2rad(lat1)
+        lon2 = np.deg2rad(lon2)
+        lat2 = np.deg2rad(lat2)
 
         # Latitude and longitude differences
         dlat = (lat2 - lat1) / 2
         dlon = (lon2 - lon1) / 2
 
         # Haversine function.
-        distance = xr.ufuncs.sin(dlat) ** 2 + xr.ufuncs.cos(lat1) * xr.ufuncs.cos(lat2) * xr.ufuncs.sin(dlon) ** 2
-        distance = 2 * 6371.007176 * xr.ufuncs.arcsin(xr.ufuncs.sqrt(distance))
+        distance = np.sin(dlat) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon) ** 2
+        distance = 2 * 6371.007176 * np.arcsin(np.sqrt(distance))
 
         return distance
 
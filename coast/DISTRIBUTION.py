@@ -4,6 +4,10 @@ from . import stats_util
 from .logging_util import get_slug, debug, error
 import scipy.stats
 import xarray as xr
+try:
+    import numba
+except ImportError:  # Optional dependency, np.searchsorted used in its absence
+    numba = None
 
 class DISTRIBUTION:
     '''
@@ -109,10 +113,12 @@ class DISTRIBUTION:
         debug(f"Estimating CDF using {get_slug(x)}")
         if cdf_func=='gaussian': #If Gaussian, integrate under pdf
             pdf = DISTRIBUTION.normal_distribution(mu=mu, sigma=sigma, x=x)
-            cdf = [np.trapz(pdf[:ii],x[:ii]) for ii in range(0,len(x))]
+            # Running sum of trapezium areas between consecutive x values
+            areas = 0.5*(pdf[1:] + pdf[:-1])*np.diff(x)
+            cdf = np.concatenate(([0.0], np.cumsum(areas)))
         else: 
             raise NotImplementedError
-        return np.array(cdf)
+        return cdf
     
     @staticmethod
     def empirical_distribution(x, sample):
@@ -122,16 +128,32 @@ class DISTRIBUTION:
         x      -- Array of x-values over which to generate distribution
         sample -- Sample to use to generate distribution
         
-        return: Array of len(x) containing corresponding EDF values
+        return: Array of len(x) containing corresponding EDF values. NaN
+                values in x are given an EDF of 0.
         """
         debug(f"Estimating empirical distribution with {get_slug(x)}")
         sample = np.array(sample)
         sample = sample[~np.isnan(sample)]
         sample = np.sort(sample)
-        edf = np.zeros(len(x))
+        x = np.asarray(x, dtype=np.float64)
         n_sample = len(sample)
-        for ss in sample:
-            edf[x>ss] = edf[x>ss] + 1/n_sample
+        if n_sample == 0:
+            # Nothing to count below any x
+            return xr.DataArray(np.zeros(x.shape))
+        if (numba is not None and x.ndim == 1
+                and x.size*np.log2(max(n_sample, 2)) > n_sample
+                and np.all(x[1:] >= x[:-1])):
+            # For an increasing x that is not much shorter than the sample, a
+            # single pass walking both arrays together beats a binary search
+            # per x value
+            edf = _edf(x, sample.astype(np.float64))
+        else:
+            # Fraction of sample strictly below each x (sample sorted, so
+            # this is the insertion point from the left)
+            edf = np.searchsorted(sample, x, side='left')/n_sample
+        # No sample value compares below a NaN x, so its EDF is 0 (rather
+        # than the 1 that sorting NaN to the end would give)
+        edf[np.isnan(x)] = 0
         return xr.DataArray(edf)
         
     def get_common_x(self, other, n_pts=2000):
@@ -189,4 +211,22 @@ class DISTRIBUTION:
         if plot:
             return integral, fig, ax
         else:
-            return integral
\ No newline at end of file
+            return integral
+
+def _edf(x_sorted, sample_sorted):
+    '''
+    Fraction of sample_sorted strictly below each value of x_sorted. Both
+    arrays must be sorted in increasing order. Compiled with numba if
+    available.
+    '''
+    out = np.empty_like(x_sorted)
+    n = len(sample_sorted)
+    jj = 0
+    for ii in range(len(x_sorted)):
+        while jj < n and sample_sorted[jj] < x_sorted[ii]:
+            jj += 1
+        out[ii] = jj/n
+    return out
+
+if numba is not None:
+    _edf = numba.njit(cache=True)(_edf)
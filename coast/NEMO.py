@@ -115,11 +115,18 @@ class NEMO(COAsT):  # TODO Complete this docstring
                                    'ln_sco':'ln_sco', 'bottom_level':'bottom_level'}
 
     # TODO Add parameter type hints and a docstring
-    def load_domain(self, fn_domain, chunks):  # TODO Do something with this unused parameter or remove it
-        ''' Loads domain file and renames dimensions with dim_mapping_domain'''
+    def load_domain(self, fn_domain, chunks):
+        ''' Loads domain file and renames dimensions with dim_mapping_domain.
+        fn_domain may also be an already opened xarray dataset, of which a
+        shallow copy is used so the caller's dataset is left unchanged.
+        chunks are passed to xarray.open_dataset (dimensions not in the
+        domain file are ignored, {} uses the chunking on disk).'''
         # Load xarray dataset
-        info(f"Loading domain: \"{fn_domain}\"")
-        dataset_domain = xr.open_dataset(fn_domain)
+        if isinstance(fn_domain, xr.Dataset):
+            dataset_domain = fn_domain.copy()
+        else:
+            info(f"Loading domain: \"{fn_domain}\"")
+            dataset_domain = xr.open_dataset(fn_domain, chunks=chunks)
         self.domain_loaded = True
         # Rename dimensions
         for key, value in self.dim_mapping_domain.items():
@@ -196,6 +203,9 @@ class NEMO(COAsT):  # TODO Complete this docstring
                           "this variable."))
             debug(f"The bathy_metry variable was missing from the domain_cfg for "
                   f"{get_slug(self)} with {get_slug(dataset_domain)}")
+        # Copy so that averaging onto the u/v/f-grid below does not write into
+        # the domain dataset, which may be shared with other NEMO objects
+        bathymetry = bathymetry.copy(data=np.array(bathymetry))
         try:
             if self.grid_ref == 't-grid':
                 e3w_0 = np.squeeze( dataset_domain.e3w_0.values )
@@ -307,8 +317,8 @@ class NEMO(COAsT):  # TODO Complete this docstring
 
         line_length = max(np.abs(j2 - j1), np.abs(i2 - i1)) + 1
 
-        jj1 = [int(jj) for jj in np.round(np.linspace(j1, j2, num=line_length))]
-        ii1 = [int(ii) for ii in np.round(np.linspace(i1, i2, num=line_length))]
+        jj1 = np.round(np.linspace(j1, j2, num=line_length)).astype(int)
+        ii1 = np.round(np.linspace(i1, i2, num=line_length)).astype(int)
 
         return jj1, ii1, line_length
     
@@ -626,18 +636,15 @@ class NEMO(COAsT):  # TODO Complete this docstring
         Input variable is expected to be hourly.
         Output is saved back to original dataset as {var_str}_dxo
         
-        !!WARNING: Will load in entire variable to memory. If dataset large,
-        then subset before using this method or ensure you have enough free 
-        RAM to hold the variable (twice). 
+        If the variable is dask-backed the filter is applied lazily, chunk
+        by chunk. Otherwise it is applied to the in-memory array.
         
         DB:: Currently not tested in unit_test.py'''
         var = self.dataset[var_str]
         new_var_str = var_str + '_dx0'
-        old_dims = var.dims
-        time_index = old_dims.index('t_dim')
-        filtered = stats_util.doodson_x0_filter(var, ax=time_index)
+        filtered = stats_util.doodson_x0_filter_dataarray(var, dim='t_dim')
         if filtered is not None:
-            self.dataset[new_var_str] = (old_dims, filtered)
+            self.dataset[new_var_str] = filtered
         return
        
     
@@ -668,7 +675,8 @@ class NEMO(COAsT):  # TODO Complete this docstring
         e3v : (boolean), true if e3v is to be returned. Default False.
         e3f : (boolean), true if e3f is to be returned. Default False.
         e3w : (boolean), true if e3w is to be returned. Default False.
-        dom_fn : (str), Optional, path to domain_cfg file. 
+        dom_fn : (str), Optional, path to domain_cfg file (or the opened
+                 xarray dataset). 
 
         Returns
         -------
@@ -690,7 +698,9 @@ class NEMO(COAsT):  # TODO Complete this docstring
         if dom_fn is None:
             dom_fn = nemo_t.filename_domain
         try:
-            ds_dom = xr.open_dataset(dom_fn).squeeze().rename(
+            if not isinstance(dom_fn, xr.Dataset):
+                dom_fn = xr.open_dataset(dom_fn)
+            ds_dom = dom_fn.squeeze().rename(
                 {'z':'z_dim', 'x':'x_dim', 'y':'y_dim'})
         except OSError:
             print(f'Problem opening domain_cfg file: {dom_fn}')
@@ -699,7 +709,10 @@ class NEMO(COAsT):  # TODO Complete this docstring
         e3t_0 = ds_dom.e3t_0
     
         # Water column thickness, i.e. depth of bottom w-level on horizontal t-grid
-        H = e3t_0.cumsum(dim='z_dim').isel(z_dim=ds_dom.bottom_level.astype("int")-1)
+        # (bottom_level is computed first, as a dask-backed domain cannot be
+        # used as a vectorised indexer)
+        bottom_ind = ds_dom.bottom_level.astype("int").compute() - 1
+        H = e3t_0.cumsum(dim='z_dim').isel(z_dim=bottom_ind)
         # Add correction to e3t_0 due to change in ssh
         e3t_new = e3t_0 * ( 1 + ssh / H )
         # preserve dimension ordering
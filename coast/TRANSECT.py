@@ -130,7 +130,7 @@ class Transect:
                 # Get points on transect    
                 tran_y_ind, tran_x_ind, tran_len = nemo.transect_indices(self.point_A, self.point_B)
                 tran_y_ind, tran_x_ind = self.process_transect_indices( nemo, \
-                                        np.asarray(tran_y_ind), np.asarray(tran_x_ind) )
+                                        tran_y_ind, tran_x_ind )
             elif y_indices is not None and x_indices is not None:
                 if y_indices[0] > y_indices[-1]:
                     y_indices = y_indices[::-1]
@@ -320,9 +320,11 @@ class Transect_f(Transect):
         # subset the u and v datasets 
         da_y_ind = xr.DataArray( self.y_ind, dims=['r_dim'] )
         da_x_ind = xr.DataArray( self.x_ind, dims=['r_dim'] )
-        u_ds = nemo_u.dataset.isel(y_dim = da_y_ind, x_dim = da_x_ind)
-        v_ds = nemo_v.dataset.isel(y_dim = da_y_ind, x_dim = da_x_ind)
-        
+        # The subsets are small and each variable is read several times below,
+        # so compute them once rather than on every access to a lazy array
+        u_ds = nemo_u.dataset.isel(y_dim = da_y_ind, x_dim = da_x_ind).compute()
+        v_ds = nemo_v.dataset.isel(y_dim = da_y_ind, x_dim = da_x_ind).compute()
+
         # use time varying if e3 is present, if not default to e3_0
         if 'e3' not in u_ds.data_vars:
             if 'e3_0' not in u_ds.data_vars:
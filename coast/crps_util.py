@@ -226,24 +226,38 @@ def crps_sonf_moving( mod_array, obs_lon, obs_lat, obs_var, obs_time,
     crps_list     = np.zeros( n_neighbourhoods )*np.nan
     n_model_pts   = np.zeros( n_neighbourhoods )*np.nan
     contains_land = np.zeros( n_neighbourhoods , dtype=bool)
+    # Get model neighbourhoods for all (valid) observation locations at once,
+    # using a (cached) BallTree over the model grid
+    mod_lon = np.asarray(mod_array.longitude)
+    mod_lat = np.asarray(mod_array.latitude)
+    obs_lon = np.asarray(obs_lon)
+    obs_lat = np.asarray(obs_lat)
+    valid = np.isfinite(obs_lon) & np.isfinite(obs_lat)
+    nh_ind = np.empty(n_neighbourhoods, dtype=object)
+    nh_ind[:] = [np.array([], dtype=int)]*n_neighbourhoods
+    # Model points with NaN coordinates are left out of the tree (they can
+    # never be within the radius)
+    mod_mask = ~(np.isfinite(mod_lon) & np.isfinite(mod_lat))
+    if not np.any(mod_mask):
+        mod_mask = None
+    if np.any(valid):
+        grid_index = general_utils.get_grid_index(mod_lon, mod_lat, 
+                                                  mask=mod_mask,
+                                                  backend='balltree')
+        nh_ind[valid] = grid_index.query_radius(obs_lon[valid], obs_lat[valid],
+                                                nh_radius/6371.007176)
     # Loop over neighbourhoods
     neighbourhood_indices = np.arange(0,n_neighbourhoods)
     for ii in neighbourhood_indices:
-        # Neighbourhood centre
-        cntr_lon = obs_lon[ii]
-        cntr_lat = obs_lat[ii]
-    
-        # Get model neighbourhood subset using specified method
-        subset_ind = general_utils.subset_indices_by_distance(
-                         mod_array.longitude, mod_array.latitude, 
-                         cntr_lon, cntr_lat, nh_radius)
+        # Model neighbourhood subset, in grid order
+        subset_ind = np.unravel_index(np.sort(nh_ind[ii]), mod_lon.shape)
         # Check that the model neighbourhood contains points
-        if subset_ind[0].shape[0] == 0 or subset_ind[1].shape[0] == 0:
+        if subset_ind[0].shape[0] == 0:
             crps_list[ii] = np.nan
         else:
             # Subset model data in time and space: model -> obs
-            mod_subset = mod_array.isel(y_dim = subset_ind[0],
-                                        x_dim = subset_ind[1])
+            mod_subset = mod_array.isel(y_dim = xr.DataArray(subset_ind[0]),
+                                        x_dim = xr.DataArray(subset_ind[1]))
             mod_subset = mod_subset.swap_dims({'t_dim':'time'})
             mod_subset = mod_subset.interp(
                              time = obs_time[ii], method = time_interp,
@@ -259,6 +273,5 @@ def crps_sonf_moving( mod_array, obs_lon, obs_lat, obs_var, obs_time,
                 # Calculate CRPS and put into output array
                 crps_list[ii] = crps_empirical(mod_subset, obs_var[ii])
                 n_model_pts[ii] = int(mod_subset.shape[0])
-        crps_mean = np.nanmean(crps_list)
                 
     return crps_list, n_model_pts, contains_land
\ No newline at end of file
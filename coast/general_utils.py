@@ -2,15 +2,24 @@ from dask import delayed
 from dask import array
 import xarray as xr
 import numpy as np
+import pandas as pd
 from dask.distributed import Client
 from warnings import warn
 import copy
+import hashlib
 import scipy as sp
 from .logging_util import get_slug, debug, info, warn, error
 import sklearn.neighbors as nb
+from joblib import Parallel
+from joblib import delayed as joblib_delayed
+try:
+    import pys2index
+except ImportError:  # Optional dependency, BallTree is used in its absence
+    pys2index = None
 
 def subset_indices_by_distance_BT(longitude, latitude, centre_lon, centre_lat, 
-        radius: float, mask=None
+        radius: float, mask=None, chunk_size: int = 1024,
+        leaf_size: int = 16, n_jobs: int = -1
     ):
     """
     Returns the indices of points that lie within a specified radius (km) of
@@ -25,6 +34,13 @@ def subset_indices_by_distance_BT(longitude, latitude, centre_lon, centre_lat,
     radius      : (float) Radius in km within which to find indices
     mask        : (numpy.ndarray) of same dimension as longitude and latitude.
                   If specified, will mask out points from the routine.
+    chunk_size  : (int) Number of centres to query at once. Bounds the memory
+                  used by BallTree.query_radius for many centres.
+    leaf_size   : (int) BallTree leaf size. Very small leaves make for a deep
+                  tree that is slow to build and query.
+    n_jobs      : (int) Number of threads over which chunks of centres are
+                  queried. -1 uses all processors. BallTree releases the GIL
+                  while querying so threads run concurrently.
     Returns
     -------
         Returns an array of indices corresponding to points within radius.
@@ -52,28 +68,11 @@ def subset_indices_by_distance_BT(longitude, latitude, centre_lon, centre_lat,
         centre_lon = np.array(centre_lon)
     # Determine number of centres provided
     n_pts = 1 if centre_lat.shape==() else len(centre_lat)
-    # If a mask is supplied, remove indices from arrays. Flatten input ready
-    # for BallTree
-    if mask is None:
-        longitude = longitude.flatten()
-        latitude = latitude.flatten()
-    else:
-        longitude[mask] = np.nan
-        latitude[mask] = np.nan
-        longitude = longitude.flatten()
-        latitude = latitude.flatten()
-    # Put lons and lats into 2D location arrays for BallTree: [lat, lon]
-    locs = np.vstack((latitude, longitude)).transpose()
-    locs = np.radians(locs)
-    # Construct central input to BallTree.query_radius
-    if n_pts==1:
-        centre = np.array([[centre_lat, centre_lon]])
-    else:
-        centre = np.vstack((centre_lat, centre_lon)).transpose()
-    centre = np.radians(centre)
-    # Do nearest neighbour interpolation using BallTree (gets indices)
-    tree = nb.BallTree(locs, leaf_size=2, metric='haversine')
-    ind_1d = tree.query_radius(centre, r = r_rad)
+    # Get (cached) BallTree over the grid and query it around each centre
+    grid_index = get_grid_index(longitude, latitude, mask=mask, 
+                                backend='balltree', leaf_size=leaf_size)
+    ind_1d = grid_index.query_radius(centre_lon, centre_lat, r_rad,
+                                     chunk_size=chunk_size, n_jobs=n_jobs)
     if len(original_shape) == 1:
         return ind_1d
     else:
@@ -96,7 +95,9 @@ def subset_indices_by_distance(
     """
     This method returns a `tuple` of indices within the `radius` of the 
     lon/lat point given by the user.
-    Scikit-learn BallTree is used to obtain indices.
+    Points are first filtered to a lat/lon box around the centre that
+    contains the whole radius, then haversine distance is compared with
+    radius for the points in the box only.
     :param centre_lon: The longitude of the users central point
     :param centre_lat: The latitude of the users central point
     :param radius: The haversine distance (in km) from the central point
@@ -104,18 +105,51 @@ def subset_indices_by_distance(
             central point
     """
 
-    # Calculate the distances between every model point and the specified
-    # centre. Calls another routine dist_haversine.
-    dist = calculate_haversine_distance(centre_lon, centre_lat, 
-                                        longitude, latitude)
-    indices_bool = dist < radius
-    indices = np.where(indices_bool)
+    longitude = np.asarray(longitude)
+    latitude = np.asarray(latitude)
+    hav_radius = np.sin(radius / (2 * 6371.007176)) ** 2
+
+    # Coarse filter: points within radius must lie in a lat/lon box around
+    # the centre. Only these candidates need the haversine check.
+    candidates = _distance_box_indices(longitude, latitude, centre_lon,
+                                       centre_lat, radius)
+
+    # Compare the haversine term between candidate model points and the
+    # specified centre against that of the radius. Avoids arcsin/sqrt.
+    hav = _haversine_term(centre_lon, centre_lat, 
+                          longitude.ravel()[candidates],
+                          latitude.ravel()[candidates])
+    indices = np.unravel_index(candidates[hav < hav_radius], longitude.shape)
 
     if len(longitude.shape) == 1:
         return xr.DataArray(indices[0])
     else:
         return xr.DataArray(indices[0]), xr.DataArray(indices[1])
 
+def _distance_box_indices(longitude, latitude, centre_lon, centre_lat,
+                          radius: float):
+    '''
+    # Flat indices of points in the smallest lat/lon box that contains all
+    # points within radius (km) of a single centre. Any point within radius
+    # is in the box, but not every point in the box is within radius.
+    # If more than one centre is given, all indices are returned.
+    '''
+    if np.size(centre_lon) != 1:
+        return np.arange(np.size(longitude))
+    centre_lon = float(centre_lon)
+    centre_lat = float(centre_lat)
+    # Angular radius, with a little slack so rounding cannot exclude points
+    r_ang = radius / 6371.007176 * (1 + 1e-6)
+    in_box = np.abs(latitude.ravel() - centre_lat) <= np.degrees(r_ang)
+    # Largest longitude difference of a point within r_ang of the centre,
+    # unless the radius reaches over a pole.
+    if np.abs(centre_lat) + np.degrees(r_ang) < 90:
+        dlon_max = np.degrees(np.arcsin(min(1, np.sin(r_ang) 
+                                              / np.cos(np.radians(centre_lat)))))
+        dlon = np.abs((longitude.ravel() - centre_lon + 180) % 360 - 180)
+        in_box &= dlon <= dlon_max
+    return np.flatnonzero(in_box)
+
 def compare_angles(a1,a2,degrees=True):
     '''
     # Compares the difference between two angles. e.g. it is 2 degrees between
@@ -175,33 +209,53 @@ def calculate_haversine_distance(lon1, lat1, lon2, lat2):
     # lon2, lat2 :: Location(s) 2.
     '''
 
-    # Convert to radians for calculations
-    lon1 = xr.ufuncs.deg2rad(lon1)
-    lat1 = xr.ufuncs.deg2rad(lat1)
-    lon2 = xr.ufuncs.deg2rad(lon2)
-    lat2 = xr.ufuncs.deg2rad(lat2)
+    distance = _haversine_term(lon1, lat1, lon2, lat2)
+    distance = 2 * 6371.007176 * np.arcsin(np.sqrt(distance))
+
+    return distance
+
+def _latlon_locations(latitude, longitude, radians: bool = True):
+    '''
+    # Stacks (flattened) latitudes and longitudes into an (N, 2) array of
+    # [lat, lon] locations, as used by BallTree and S2PointIndex. The array
+    # is filled and converted to radians in place, so no intermediate
+    # copies are made.
+    '''
+    latitude = np.asarray(latitude)
+    locs = np.empty((latitude.size, 2), dtype=np.float64)
+    locs[:, 0] = latitude.ravel()
+    locs[:, 1] = np.asarray(longitude).ravel()
+    if radians:
+        locs *= np.pi/180
+    return locs
+
+def _haversine_term(lon1, lat1, lon2, lat2):
+    '''
+    # Haversine of the central angle between location(s) 1 and 2, i.e. the
+    # term inside arcsin(sqrt()) of the haversine distance. It increases
+    # monotonically with distance, so can be compared against a radius
+    # without taking arcsin and sqrt of every element.
+    '''
+    # Convert to float64 numpy arrays in radians for calculations
+    lon1 = np.deg2rad(np.asarray(lon1, dtype=np.float64))
+    lat1 = np.deg2rad(np.asarray(lat1, dtype=np.float64))
+    lon2 = np.deg2rad(np.asarray(lon2, dtype=np.float64))
+    lat2 = np.deg2rad(np.asarray(lat2, dtype=np.float64))
 
     # Latitude and longitude differences
     dlat = (lat2 - lat1) / 2
     dlon = (lon2 - lon1) / 2
 
     # Haversine function.
-    distance = xr.ufuncs.sin(dlat) ** 2 + xr.ufuncs.cos(lat1) * \
-               xr.ufuncs.cos(lat2) * xr.ufuncs.sin(dlon) ** 2
-    distance = 2 * 6371.007176 * xr.ufuncs.arcsin(xr.ufuncs.sqrt(distance))
-
-    return distance
+    return np.sin(dlat) ** 2 + np.cos(lat1) * np.cos(lat2) * \
+           np.sin(dlon) ** 2
 
 def remove_indices_by_mask(A, mask):
     '''
     Removes indices from a 2-dimensional array, A, based on true elements of
     mask. A and mask variable should have the same shape.
     '''
-    A = np.array(A).flatten()
-    mask = np.array(mask, dtype=bool).flatten()
-    array_removed = A[~mask]
-
-    return array_removed
+    return np.asarray(A).ravel()[~np.asarray(mask, dtype=bool).ravel()]
 
 def reinstate_indices_by_mask(array_removed, mask, fill_value=np.nan):
     '''
@@ -209,22 +263,21 @@ def reinstate_indices_by_mask(array_removed, mask, fill_value=np.nan):
     False elements of mask will be populated using array_removed. MAsked
     indices will be replaced with fill_value
     '''
-    array_removed = np.array(array_removed)
-    original_shape = mask.shape
-    mask = np.array(mask, dtype=bool).flatten()
-    A = np.zeros(mask.shape)
-    A[~mask] = array_removed
-    A[mask] = fill_value
-    A = A.reshape(original_shape)
+    mask = np.asarray(mask, dtype=bool)
+    A = np.full(mask.shape, fill_value, dtype=np.float64)
+    A.reshape(-1)[~mask.ravel()] = array_removed
     return A
 
 def nearest_indices_2D(mod_lon, mod_lat, new_lon, new_lat,
-                       mask = None):
+                       mask = None, backend: str = 's2', leaf_size: int = 16):
     '''
     Obtains the 2 dimensional indices of the nearest model points to specified
-    lists of longitudes and latitudes. Makes use of sklearn.neighbours
-    and its BallTree haversine method. Ensure there are no NaNs in 
+    lists of longitudes and latitudes. Makes use of the pys2index S2PointIndex
+    if it is installed, otherwise sklearn.neighbours and its BallTree
+    haversine method. Ensure there are no NaNs in 
     input longitude/latitude arrays (or mask them using "mask"")
+    The index built over the model grid is cached (see get_grid_index()), so
+    repeated calls for the same grid only pay for the queries.
 
     Example Useage
     ----------
@@ -243,63 +296,292 @@ def nearest_indices_2D(mod_lon, mod_lat, new_lon, new_lat,
     mask (2D array): Mask array. Where True (or 1), elements of array will
                      not be included. For example, use to mask out land in
                      case it ends up as the nearest point.
+    backend (str): Nearest neighbour search to use. Either 's2' (pys2index,
+                   falls back to 'balltree' if not installed) or 'balltree'.
+    leaf_size (int): BallTree leaf size, used for the 'balltree' backend.
 
     Returns
     -------
     Array of x indices, Array of y indices
     '''
-    # Cast lat/lon to numpy arrays in case xarray things
-    new_lon = np.array(new_lon)
-    new_lat = np.array(new_lat)
-    mod_lon = np.array(mod_lon)
-    mod_lat = np.array(mod_lat)
-    original_shape = mod_lon.shape
-
-    # If a mask is supplied, remove indices from arrays.
-    if mask is None:
-        mod_lon = mod_lon.flatten()
-        mod_lat = mod_lat.flatten()
-    else:
-        mod_lon = remove_indices_by_mask(mod_lon, mask)
-        mod_lat = remove_indices_by_mask(mod_lat, mask)
-        # If we are masking, we want to preserve the original indices so that
-        # we can get them back at the end (since masked points are removed).
-        cc, rr = np.meshgrid( np.arange(0,original_shape[1]), 
-                             np.arange(0,original_shape[0]))
-        cc = remove_indices_by_mask(cc, mask)
-        rr = remove_indices_by_mask(rr, mask)
-    
-
-    # Put lons and lats into 2D location arrays for BallTree: [lat, lon]
-    mod_loc = np.vstack((mod_lat, mod_lon)).transpose()
-    new_loc = np.vstack((new_lat, new_lon)).transpose()
+    # Get (cached) index over model points and query the new locations
+    grid_index = get_grid_index(mod_lon, mod_lat, mask=mask, backend=backend,
+                                leaf_size=leaf_size)
+    ind_y, ind_x = grid_index.query(new_lon, new_lat)
 
-    # Convert lat/lon to radians for BallTree
-    mod_loc = np.radians(mod_loc)
-    new_loc = np.radians(new_loc)
-
-    # Do nearest neighbour interpolation using BallTree (gets indices)
-    tree = nb.BallTree(mod_loc, leaf_size=5, metric='haversine')
-    _, ind_1d = tree.query(new_loc, k=1)
-    
-    if mask is None:
-        # Get 2D indices from 1D index output from BallTree
-        ind_y, ind_x = np.unravel_index(ind_1d, original_shape)
-    else:
-        ind_y = rr[ind_1d]
-        ind_x = cc[ind_1d]
-        
     ind_x = xr.DataArray(ind_x.squeeze())
     ind_y = xr.DataArray(ind_y.squeeze())
         
     return ind_x, ind_y
 
+class GridIndex:
+    '''
+    A nearest neighbour index over a 2D grid of longitudes and latitudes.
+    Uses a pys2index S2PointIndex if installed (backend='s2'), otherwise a
+    sklearn BallTree with the haversine metric. Masked points (True) are
+    left out of the index. Use get_grid_index() to reuse an index built
+    for the same grid.
+
+    Unmasked regular lat/lon grids (every row the same longitudes, every
+    column the same latitudes, both evenly spaced) are handled without a
+    tree: the nearest indices of points inside the grid are found
+    arithmetically. A tree is only built if points outside the grid are
+    queried.
+    '''
+    def __init__(self, longitude, latitude, mask=None, backend: str = 's2',
+                 leaf_size: int = 16):
+        self.longitude = np.array(longitude)
+        self.latitude = np.array(latitude)
+        self.shape = self.longitude.shape
+        self.mask = mask
+        self.backend = backend
+        self.leaf_size = leaf_size
+        self.index = None
+        self.locs = None
+
+        self.regular = mask is None and self.is_regular(self.longitude, 
+                                                        self.latitude)
+        if not self.regular:
+            self.build_index()
+
+    @staticmethod
+    def is_regular(longitude, latitude, atol: float = 1e-5):
+        '''
+        True if longitude and latitude (2D, degrees) describe a regular
+        lat/lon grid with more than one point in each direction.
+        '''
+        if longitude.ndim != 2 or min(longitude.shape) < 2:
+            return False
+        lon_row = longitude[0]
+        lat_col = latitude[:, 0]
+        dlon = np.diff(lon_row)
+        dlat = np.diff(lat_col)
+        return (np.allclose(longitude, lon_row[np.newaxis, :], rtol=0, atol=atol)
+                and np.allclose(latitude, lat_col[:, np.newaxis], rtol=0, atol=atol)
+                and np.allclose(dlon, dlon[0], rtol=0, atol=atol) and dlon[0] != 0
+                and np.allclose(dlat, dlat[0], rtol=0, atol=atol) and dlat[0] != 0)
+
+    def build_index(self):
+        ''' Builds the S2PointIndex or BallTree over (unmasked) points. '''
+        # If a mask is supplied, remove indices from arrays. Keep the
+        # original flat indices of remaining points to map results back.
+        if self.mask is None:
+            self.grid_ind = None
+            longitude = self.longitude
+            latitude = self.latitude
+        else:
+            self.grid_ind = np.flatnonzero(~np.array(self.mask, dtype=bool))
+            longitude = remove_indices_by_mask(self.longitude, self.mask)
+            latitude = remove_indices_by_mask(self.latitude, self.mask)
+
+        # Put lons and lats into 2D location arrays: [lat, lon]. These are
+        # kept (BallTree uses the same memory) for reuse alongside the index.
+        if self.backend == 's2' and pys2index is not None:
+            # S2PointIndex works on lat/lon in degrees
+            self.backend = 's2'
+            self.locs = _latlon_locations(latitude, longitude, radians=False)
+            self.index = pys2index.S2PointIndex(self.locs)
+        else:
+            # BallTree works on lat/lon in radians
+            self.backend = 'balltree'
+            self.locs = _latlon_locations(latitude, longitude)
+            self.index = nb.BallTree(self.locs, leaf_size=self.leaf_size,
+                                     metric='haversine')
+
+    def query_radius(self, centre_lon, centre_lat, r_rad: float,
+                     chunk_size: int = 1024, n_jobs: int = -1):
+        '''
+        Returns an object array with, for each centre, an array of the flat
+        grid indices of points within r_rad (radians) of it. Centres are
+        queried in chunks of chunk_size to bound memory. When there is more
+        than one chunk they are shared between n_jobs threads (BallTree
+        releases the GIL during the query). Requires the 'balltree' backend
+        (S2PointIndex has no radius query).
+        '''
+        if self.index is None:
+            self.build_index()
+        if self.backend != 'balltree':
+            raise ValueError("query_radius requires backend='balltree'")
+        centre = _latlon_locations(centre_lat, centre_lon)
+        n_pts = centre.shape[0]
+        ind_1d = np.empty(n_pts, dtype=object)
+        starts = range(0, n_pts, chunk_size)
+        if len(starts) > 1 and n_jobs != 1:
+            chunks = Parallel(n_jobs=n_jobs, prefer='threads')(
+                         joblib_delayed(self.index.query_radius)(
+                             centre[ss:ss+chunk_size], r=r_rad)
+                         for ss in starts)
+        else:
+            chunks = (self.index.query_radius(centre[ss:ss+chunk_size], r=r_rad)
+                      for ss in starts)
+        for ss, chunk in zip(starts, chunks):
+            ind_1d[ss:ss+chunk_size] = chunk
+        if self.grid_ind is not None:
+            # Map indices of unmasked points back onto the original grid
+            for ii in range(n_pts):
+                ind_1d[ii] = self.grid_ind[ind_1d[ii]]
+        return ind_1d
+
+    def query(self, new_lon, new_lat):
+        '''
+        Returns 2D (y, x) indices of the nearest grid points to each of
+        new_lon, new_lat (degrees).
+        '''
+        new_lon = np.array(new_lon, dtype=np.float64).flatten()
+        new_lat = np.array(new_lat, dtype=np.float64).flatten()
+        if not self.regular:
+            return self.query_index(new_lon, new_lat)
+
+        ind_y, ind_x, inside = self.query_regular(new_lon, new_lat)
+        if not np.all(inside):
+            if self.index is None:
+                self.build_index()
+            outside = ~inside
+            ind_y[outside], ind_x[outside] = self.query_index(new_lon[outside],
+                                                              new_lat[outside])
+        return ind_y, ind_x
+
+    def query_index(self, new_lon, new_lat):
+        ''' Nearest (y, x) indices using the S2PointIndex or BallTree. '''
+        if self.backend == 's2':
+            new_loc = _latlon_locations(new_lat, new_lon, radians=False)
+            _, ind_1d = self.index.query(new_loc)
+        else:
+            new_loc = _latlon_locations(new_lat, new_lon)
+            _, ind_1d = self.index.query(new_loc, k=1)
+        ind_1d = np.asarray(ind_1d).reshape(-1)
+        if self.grid_ind is not None:
+            ind_1d = self.grid_ind[ind_1d]
+        return np.unravel_index(ind_1d, self.shape)
+
+    def query_regular(self, new_lon, new_lat):
+        '''
+        Nearest (y, x) indices on a regular grid. Indices are first
+        estimated from the grid origin and spacing. The haversine distance
+        to the 4x3 block of grid points around each estimate then picks the
+        nearest point: lines of constant latitude are not great circles,
+        so the nearest row is not simply the nearest latitude.
+        On strongly anisotropic grids (e.g. wide longitude spacing at high
+        latitude) the nearest point may lie outside this block, so the
+        result is only accepted if it is no farther than a lower bound on
+        the distance to every grid point outside the block.
+        Also returns a boolean array, False for points outside the grid or
+        whose nearest point could not be confirmed, whose indices are not
+        valid.
+        '''
+        lon_row = self.longitude[0]
+        lat_col = self.latitude[:, 0]
+        n_y, n_x = self.shape
+        inside = ((new_lon >= lon_row.min()) & (new_lon <= lon_row.max())
+                  & (new_lat >= lat_col.min()) & (new_lat <= lat_col.max()))
+
+        ind_x = np.rint((new_lon - lon_row[0])/(lon_row[-1] - lon_row[0])
+                        * (n_x - 1)).astype(int)
+        ind_y = np.floor((new_lat - lat_col[0])/(lat_col[-1] - lat_col[0])
+                         * (n_y - 1)).astype(int)
+
+        # Candidate block: rows ind_y-1..ind_y+2, columns ind_x-1..ind_x+1
+        cand_y = np.clip(ind_y[:, np.newaxis, np.newaxis] 
+                         + np.arange(-1, 3)[np.newaxis, :, np.newaxis], 0, n_y-1)
+        cand_x = np.clip(ind_x[:, np.newaxis, np.newaxis]
+                         + np.arange(-1, 2)[np.newaxis, np.newaxis, :], 0, n_x-1)
+        cand_y, cand_x = np.broadcast_arrays(cand_y, cand_x)
+        hav = _haversine_term(new_lon[:, np.newaxis, np.newaxis],
+                              new_lat[:, np.newaxis, np.newaxis],
+                              self.longitude[cand_y, cand_x],
+                              self.latitude[cand_y, cand_x])
+        hav = hav.reshape(len(new_lon), -1)
+        nearest = np.argmin(hav, axis=1)
+        hav_nearest = hav[np.arange(len(new_lon)), nearest]
+        ind_y = cand_y.reshape(len(new_lon), -1)[np.arange(len(new_lon)), nearest]
+        ind_x = cand_x.reshape(len(new_lon), -1)[np.arange(len(new_lon)), nearest]
+
+        # Lower bound (as an angle) on the distance to any point outside the
+        # block. Rows outside it are at least their latitude difference
+        # away. Columns outside it are at least as far as the nearest of
+        # their meridians, for which sin(distance) = cos(lat)*sin(dlon).
+        lat_rad = np.deg2rad(new_lat)
+        bound = np.full(len(new_lon), np.inf)
+        y_lo = np.clip(cand_y[:, 0, 0] - 1, 0, None)
+        y_hi = cand_y[:, -1, 0] + 1
+        for row, has_row in [(y_lo, cand_y[:, 0, 0] > 0), 
+                             (np.clip(y_hi, None, n_y-1), y_hi < n_y)]:
+            dlat = np.abs(lat_rad - np.deg2rad(lat_col[row]))
+            bound = np.where(has_row, np.minimum(bound, dlat), bound)
+        x_lo = cand_x[:, 0, 0]
+        x_hi = cand_x[:, 0, -1]
+        # Longitude differences are smallest at the ends of the ranges of
+        # columns outside the block, either side of it
+        for col, has_col in [(x_lo - 1, x_lo > 0), (np.zeros_like(x_lo), x_lo > 0),
+                             (x_hi + 1, x_hi < n_x-1),
+                             (np.full_like(x_hi, n_x-1), x_hi < n_x-1)]:
+            col = np.clip(col, 0, n_x-1)
+            dlon = np.abs(new_lon - lon_row[col]) % 360
+            dlon = np.deg2rad(np.minimum(np.minimum(dlon, 360 - dlon), 90))
+            dist = np.arcsin(np.clip(np.cos(lat_rad)*np.sin(dlon), 0, 1))
+            bound = np.where(has_col, np.minimum(bound, dist), bound)
+        confirmed = hav_nearest <= np.sin(np.minimum(bound, np.pi)/2)**2
+        return ind_y, ind_x, inside & confirmed
+
+_grid_index_cache = {}
+
+def get_grid_index(longitude, latitude, mask=None, backend: str = 's2',
+                   leaf_size: int = 16, max_cached: int = 4,
+                   cache: bool = True):
+    '''
+    Returns a GridIndex for the given longitudes, latitudes and mask,
+    reusing a previously built one if the same grid has been seen before.
+    Grids are identified by their shape and a hash of their values, so
+    building the index (the expensive part) only happens once per grid.
+    Up to max_cached indices are kept, oldest first out.
+
+    Each cached index holds copies of the grid longitudes and latitudes,
+    their radian locations and the tree, so on a large model grid one
+    index can take hundreds of MB. Use cache=False to build an index that
+    is not kept, or clear_grid_index_cache() to release the cached ones.
+    '''
+    if not cache:
+        return GridIndex(longitude, latitude, mask=mask, backend=backend,
+                         leaf_size=leaf_size)
+    longitude = np.ascontiguousarray(longitude)
+    latitude = np.ascontiguousarray(latitude)
+    key = [backend, leaf_size, longitude.shape,
+           hashlib.blake2b(longitude).digest(),
+           hashlib.blake2b(latitude).digest()]
+    if mask is not None:
+        key.append(hashlib.blake2b(
+                       np.ascontiguousarray(mask, dtype=bool)).digest())
+    key = tuple(key)
+
+    grid_index = _grid_index_cache.pop(key, None)
+    if grid_index is None:
+        debug(f"Building new nearest neighbour index for grid of shape "
+              f"{longitude.shape}")
+        grid_index = GridIndex(longitude, latitude, mask=mask,
+                               backend=backend, leaf_size=leaf_size)
+    _grid_index_cache[key] = grid_index
+    while len(_grid_index_cache) > max_cached:
+        _grid_index_cache.pop(next(iter(_grid_index_cache)))
+    return grid_index
+
+def clear_grid_index_cache():
+    ''' Releases all GridIndex objects cached by get_grid_index(). '''
+    debug(f"Clearing {len(_grid_index_cache)} cached nearest neighbour "
+          f"indices")
+    _grid_index_cache.clear()
+
 def dataarray_time_slice(data_array, date0, date1):
     ''' Takes an xr.DataArray object and returns a new object with times
     sliced between dates date0 and date1. date0 and date1 may be a string or
     datetime type object.'''
     if date0 is None and date1 is None:
         return data_array
+    # A DatetimeIndex, or a CFTimeIndex for non-standard calendars
+    time_index = data_array.time.to_index()
+    if time_index.is_monotonic_increasing:
+        # Find the slice positions directly rather than swapping dims. Same
+        # date handling (e.g. partial date strings) as .sel(time=slice()).
+        return data_array.isel(t_dim=time_index.slice_indexer(date0, date1))
     else:
         data_array_sliced = data_array.swap_dims({'t_dim':'time'})
         time_max = data_array.time.max().values
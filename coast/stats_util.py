@@ -11,6 +11,11 @@ import numpy as np
 import xarray as xr
 from .logging_util import get_slug, debug, info, warn, error
 import scipy
+import dask.array
+try:
+    import numba
+except ImportError:  # Optional dependency, numpy convolution used in its absence
+    numba = None
 
 def quadratic_spline_roots(spl):
     """
@@ -21,13 +26,22 @@ def quadratic_spline_roots(spl):
     Example usage:
     see example_scripts/tidegauge_tutorial.py
     """
-    roots = []
     knots = spl.get_knots()
-    for a, b in zip(knots[:-1], knots[1:]):
-        u, v, w = spl(a), spl((a+b)/2), spl(b)
-        t = np.roots([u+w-2*v, w-u, 2*v])
-        t = t[np.isreal(t) & (np.abs(t) <= 1)]
-        roots.extend(t*(b-a)/2 + (b+a)/2)
+    a, b = knots[:-1], knots[1:]
+    u, v, w = spl(a), spl((a+b)/2), spl(b)
+    # On each knot interval, mapped to t in [-1, 1], the spline is the
+    # quadratic qa*t**2 + qb*t + qc. Solve for all intervals at once.
+    qa, qb, qc = u+w-2*v, w-u, 2*v
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_disc = np.sqrt(qb*qb - 4*qa*qc)  # NaN where no real roots
+        t1 = (-qb + sqrt_disc)/(2*qa)
+        t2 = (-qb - sqrt_disc)/(2*qa)
+        t_linear = -qc/qb
+    # Where the quadratic term vanishes there is (at most) one linear root
+    quadratic = qa != 0
+    t = np.stack((np.where(quadratic, t1, t_linear),
+                  np.where(quadratic, t2, np.nan)))
+    roots = (t*(b-a)/2 + (b+a)/2)[np.abs(t) <= 1]
     return np.sort(roots)
 
 def find_maxima(x, y, method='comp', **kwargs):
@@ -61,8 +75,19 @@ def find_maxima(x, y, method='comp', **kwargs):
             method = 'comp'
 
     if method == 'comp':
-        peaks, props = scipy.signal.find_peaks(y, **kwargs)
-        return x[peaks], y[peaks]
+        # Convert to numpy once, so that a dask-backed y is only computed a
+        # single time, and index the in-memory arrays.
+        x_np = np.asarray(x)
+        y_np = np.asarray(y)
+        peaks, props = scipy.signal.find_peaks(y_np, **kwargs)
+        x_peaks = x_np[peaks]
+        y_peaks = y_np[peaks]
+        # Restore xarray structure (dims, coords, name) if given DataArrays
+        if isinstance(x, xr.DataArray):
+            x_peaks = x.isel({x.dims[0]: peaks}).copy(data=x_peaks)
+        if isinstance(y, xr.DataArray):
+            y_peaks = y.isel({y.dims[0]: peaks}).copy(data=y_peaks)
+        return x_peaks, y_peaks
 
     if method == 'cubic':
         """
@@ -91,8 +116,9 @@ def find_maxima(x, y, method='comp', **kwargs):
             y = y[np.logical_not(I)]
 
         # Sort over time. Monotonic increasing
-        y = y.sortby(x)
-        x = x.sortby(x)
+        order = np.argsort(x.values, kind='stable')
+        y = y.isel({y.dims[0]: order})
+        x = x.isel({x.dims[0]: order})
 
         # Convert x to float64 (assuming y is/similar to np.float64)
         if type(x.values[0]) == np.datetime64: # convert to decimal sec since 1970
@@ -173,7 +199,20 @@ def doodson_x0_filter(elevation, ax=0):
                      2, 1, 1, 2, 0, 1, 1, 0, 2, 0, 1, 1, 0, 1, 0, 0, 1, 0, 1])
     kern = kern/30
 
+    if numba is not None:
+        # Move time to the last axis and flatten the rest so that the
+        # compiled kernel sees a contiguous (outer, time) array.
+        elevation = np.moveaxis(np.asarray(elevation, dtype=np.float64), ax, -1)
+        original_shape = elevation.shape
+        elevation = np.ascontiguousarray(
+                        elevation.reshape(-1, original_shape[-1]))
+        filtered = _doodson_x0_convolve(elevation, kern)
+        return np.moveaxis(filtered.reshape(original_shape), -1, ax)
+
     # Convolve input array with weights along the specified axis.
+    # NB: FFT convolution (scipy.signal.oaconvolve) was tried for long
+    # series but is 2-3x slower than direct convolution for this short
+    # (39 weight) kernel, even at 1e5 hourly values.
     filtered = np.apply_along_axis(lambda m: np.convolve(m, kern, mode=1),
                                    axis=ax, arr=elevation)
 
@@ -184,3 +223,66 @@ def doodson_x0_filter(elevation, ax=0):
     filtered[-19:] = np.nan
     filtered = filtered.swapaxes(0,ax)
     return filtered
+
+def _doodson_x0_convolve(elevation, kern):
+    '''
+    Convolves each row of a 2D (outer, time) array with the symmetric
+    Doodson X0 weights. The half kernel width at either end of the time
+    axis is set to NaN. Compiled with numba (parallel over rows) if available.
+    '''
+    n_outer, n_time = elevation.shape
+    n_kern = kern.shape[0]
+    half = n_kern // 2
+    filtered = np.full((n_outer, n_time), np.nan)
+    for ii in numba.prange(n_outer):
+        for tt in range(half, n_time - half):
+            acc = 0.0
+            for kk in range(n_kern):
+                acc += kern[kk] * elevation[ii, tt - half + kk]
+            filtered[ii, tt] = acc
+    return filtered
+
+if numba is not None:
+    # fastmath is restricted to reassociation/contraction (FMA) so that NaNs
+    # in the input still propagate to the output as with np.convolve.
+    _doodson_x0_convolve = numba.njit(parallel=True,
+                                      fastmath={'reassoc', 'contract'}
+                                      )(_doodson_x0_convolve)
+
+def doodson_x0_filter_dataarray(data_array, dim: str = 't_dim'):
+    '''
+    Applies the Doodson X0 filter (see doodson_x0_filter()) to an
+    xr.DataArray along dimension dim. If the DataArray is dask-backed, the
+    filter is applied lazily chunk by chunk: each chunk is extended by 19
+    values from its neighbours along dim (NaN beyond the ends of the
+    series), filtered independently and trimmed again. The whole array is
+    never loaded into memory.
+
+    Parameters
+    ----------
+        data_array (xr.DataArray) : Array of hourly values.
+        dim (str) : Time dimension. Must have >= 39 elements.
+
+    Returns
+    -------
+        Filtered xr.DataArray with the same dims and coords as data_array.
+        Its attrs are those of data_array, without standard_name and with
+        long_name marked as filtered.
+    '''
+    ax = data_array.dims.index(dim)
+    if data_array.shape[ax] < 39:
+        print('Doodson_XO: Ensure time axis has >=39 elements. Returning.')
+        return
+    if isinstance(data_array.data, dask.array.Array):
+        filtered = dask.array.map_overlap(
+                       doodson_x0_filter, data_array.data,
+                       depth={ax: 19}, boundary={ax: np.nan}, ax=ax,
+                       dtype=np.float64, meta=np.array((), dtype=np.float64))
+    else:
+        filtered = doodson_x0_filter(data_array.values, ax=ax)
+    filtered = data_array.copy(data=filtered)
+    # The filtered field is no longer the quantity named by standard_name
+    filtered.attrs.pop('standard_name', None)
+    if 'long_name' in filtered.attrs:
+        filtered.attrs['long_name'] += ' (Doodson X0 filtered)'
+    return filtered
@@ -0,0 +1,30 @@
+# Test with PyTest
+
+import numpy as np
+import xarray as xr
+import coast.crps_util as crps_util
+import coast.general_utils as general_utils
+
+
+def test_crps_sonf_moving_nan_model_coordinates():
+    lon, lat = np.meshgrid(np.linspace(-1, 1, 21), np.linspace(50, 52, 21))
+    lon[0, 0] = np.nan
+    lat[-1, -1] = np.nan
+    time = np.arange('2007-01-01T00', '2007-01-01T04', dtype='datetime64[h]')
+    rng = np.random.default_rng(0)
+    mod_array = xr.DataArray(rng.random((len(time),) + lon.shape), 
+                             dims=('t_dim', 'y_dim', 'x_dim'),
+                             coords={'longitude': (('y_dim', 'x_dim'), lon),
+                                     'latitude': (('y_dim', 'x_dim'), lat),
+                                     'time': ('t_dim', time)})
+    obs_lon = np.array([-1, 0, 1, np.nan])
+    obs_lat = np.array([50, 51, 52, 51])
+    obs_var = np.array([0.5, 0.5, 0.5, 0.5])
+    obs_time = time[[1, 1, 2, 2]]
+    crps, n_model_pts, _ = crps_util.crps_sonf_moving(mod_array, obs_lon, obs_lat, obs_var,
+                                                      obs_time, 15, 'linear')
+    assert np.all(np.isfinite(crps[:3])) and np.isnan(crps[3])
+    # NaN-coordinate model points are never in a neighbourhood
+    for ii in range(3):
+        distance = general_utils.calculate_haversine_distance(obs_lon[ii], obs_lat[ii], lon, lat)
+        assert n_model_pts[ii] == np.sum(distance < 15)
@@ -0,0 +1,45 @@
+# Test with PyTest
+
+import numpy as np
+from coast import DISTRIBUTION
+
+
+def test_empirical_distribution():
+    sample = np.array([0.0, 1.0, 1.0, np.nan, 3.0])
+    x = np.array([-1.0, 0.0, 0.5, 1.0, 2.0, 3.0, 4.0])
+    edf = DISTRIBUTION.empirical_distribution(x, sample)
+    assert np.allclose(edf, [0, 0, 0.25, 0.25, 0.75, 0.75, 1])
+
+
+def test_cumulative_distribution():
+    x = np.linspace(-5, 5, 1001)
+    cdf = DISTRIBUTION.cumulative_distribution(mu=0, sigma=1, x=x)
+    assert cdf.shape == x.shape
+    assert cdf[0] == 0
+    assert np.isclose(cdf[500], 0.5, atol=1e-4)
+    assert np.isclose(cdf[-1], 1, atol=1e-4)
+
+
+def test_empirical_distribution_long_x():
+    rng = np.random.default_rng(0)
+    sample = rng.standard_normal(100)
+    x = np.linspace(-4, 4, 1000)
+    edf = DISTRIBUTION.empirical_distribution(x, sample)
+    assert np.allclose(edf, np.mean(sample[:, None] < x, axis=0))
+
+
+def test_empirical_distribution_nan_x():
+    sample = np.array([0.0, 1.0, 2.0])
+    x = np.array([np.nan, 1.5, np.nan])
+    edf = DISTRIBUTION.empirical_distribution(x, sample)
+    assert np.allclose(edf, [0, 2/3, 0])
+
+
+def test_empirical_distribution_empty_sample():
+    x = np.linspace(-4, 4, 1000)
+    for sample in [[], [np.nan, np.nan]]:
+        edf = DISTRIBUTION.empirical_distribution(x, sample)
+        assert edf.shape == x.shape
+        assert np.all(edf == 0)
+        edf = DISTRIBUTION.empirical_distribution(x[:3], sample)
+        assert np.all(edf == 0)
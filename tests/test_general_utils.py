@@ -0,0 +1,173 @@
+# Test with PyTest
+
+import numpy as np
+import pytest
+import xarray as xr
+import coast.general_utils as general_utils
+
+
+def regular_grid():
+    lon, lat = np.meshgrid(np.linspace(-10, 10, 41), np.linspace(45, 60, 31))
+    return lon, lat
+
+
+def test_nearest_indices_2D():
+    lon, lat = regular_grid()
+    ind_x, ind_y = general_utils.nearest_indices_2D(lon, lat, [0.1, 5.2], [50.1, 55.2])
+    assert list(ind_x.values) == [20, 30]
+    assert list(ind_y.values) == [10, 20]
+
+
+def test_nearest_indices_2D_balltree_backend():
+    lon, lat = regular_grid()
+    ind_x, ind_y = general_utils.nearest_indices_2D(lon, lat, [0.1, 5.2], [50.1, 55.2],
+                                                    backend='balltree')
+    assert list(ind_x.values) == [20, 30]
+    assert list(ind_y.values) == [10, 20]
+
+
+def test_nearest_indices_2D_mask():
+    lon, lat = regular_grid()
+    mask = np.zeros(lon.shape, dtype=bool)
+    mask[10, 20] = True
+    ind_x, ind_y = general_utils.nearest_indices_2D(lon, lat, [0.1], [50.1], mask=mask)
+    assert (int(ind_y), int(ind_x)) != (10, 20)
+    assert abs(int(ind_x) - 20) <= 1 and abs(int(ind_y) - 10) <= 1
+
+
+def test_subset_indices_by_distance_BT_chunked():
+    lon, lat = regular_grid()
+    centre_lon = np.array([0, 5, -5])
+    centre_lat = np.array([50, 55, 52])
+    ind_x, ind_y = general_utils.subset_indices_by_distance_BT(
+        lon, lat, centre_lon, centre_lat, 100)
+    ind_x_c, ind_y_c = general_utils.subset_indices_by_distance_BT(
+        lon, lat, centre_lon, centre_lat, 100, chunk_size=2)
+    assert len(ind_x_c) == 3
+    for ii in range(3):
+        assert np.array_equal(ind_x[ii], ind_x_c[ii])
+        assert np.array_equal(ind_y[ii], ind_y_c[ii])
+
+
+def test_calculate_haversine_distance():
+    # One degree of latitude along a meridian
+    distance = general_utils.calculate_haversine_distance(0, 50, [0, 0], [51, 50])
+    assert np.allclose(distance, [111.195, 0], atol=1e-3)
+
+
+def test_subset_indices_by_distance():
+    lon, lat = regular_grid()
+    ind_y, ind_x = general_utils.subset_indices_by_distance(lon, lat, 0, 50, 100)
+    distance = general_utils.calculate_haversine_distance(0, 50, lon, lat)
+    ref_y, ref_x = np.where(distance < 100)
+    assert np.array_equal(ind_y, ref_y) and np.array_equal(ind_x, ref_x)
+
+
+def test_get_grid_index_cached():
+    lon, lat = regular_grid()
+    index1 = general_utils.get_grid_index(lon, lat, backend='balltree')
+    index2 = general_utils.get_grid_index(lon.copy(), lat.copy(), backend='balltree')
+    index3 = general_utils.get_grid_index(lon, lat + 1, backend='balltree')
+    assert index1 is index2
+    assert index1 is not index3
+    assert general_utils.get_grid_index(lon, lat, backend='balltree', cache=False) is not index1
+    general_utils.clear_grid_index_cache()
+    assert general_utils.get_grid_index(lon, lat, backend='balltree') is not index1
+
+
+def test_remove_and_reinstate_indices_by_mask():
+    A = np.arange(12.).reshape(3, 4)
+    mask = A % 5 == 0
+    removed = general_utils.remove_indices_by_mask(A, mask)
+    assert np.array_equal(removed, A[~mask])
+    reinstated = general_utils.reinstate_indices_by_mask(removed, mask)
+    assert np.array_equal(reinstated[~mask], A[~mask])
+    assert np.all(np.isnan(reinstated[mask]))
+    assert np.array_equal(A, np.arange(12.).reshape(3, 4))
+
+
+def test_subset_indices_by_distance_BT_mask():
+    lon, lat = regular_grid()
+    mask = np.zeros(lon.shape, dtype=bool)
+    mask[10, 20] = True
+    ind_0, ind_1 = general_utils.subset_indices_by_distance_BT(lon, lat, 0, 50, 60)
+    ind_0_m, ind_1_m = general_utils.subset_indices_by_distance_BT(lon, lat, 0, 50, 60,
+                                                                 mask=mask)
+    points = set(zip(ind_0, ind_1))
+    points_m = set(zip(ind_0_m, ind_1_m))
+    assert (10, 20) in points
+    assert points_m == points - {(10, 20)}
+    assert not np.isnan(lon).any()
+
+
+def test_dataarray_time_slice():
+    time = np.arange('2007-01-01', '2007-01-11', dtype='datetime64[D]')
+    data_array = xr.DataArray(np.arange(10), dims='t_dim', coords={'time': ('t_dim', time)})
+    sliced = general_utils.dataarray_time_slice(data_array, '2007-01-03', '2007-01-05')
+    assert list(sliced.values) == [2, 3, 4]
+    assert sliced.dims == ('t_dim',)
+    sliced = general_utils.dataarray_time_slice(data_array, None, np.datetime64('2007-01-02'))
+    assert list(sliced.values) == [0, 1]
+
+
+def test_dataarray_time_slice_cftime():
+    cftime = pytest.importorskip('cftime')
+    time = [cftime.Datetime360Day(2007, 1, day) for day in range(1, 11)]
+    data_array = xr.DataArray(np.arange(10), dims='t_dim', coords={'time': ('t_dim', time)})
+    sliced = general_utils.dataarray_time_slice(data_array, '2007-01-03', '2007-01-05')
+    assert list(sliced.values) == [2, 3, 4]
+
+
+def test_grid_index_regular_matches_tree():
+    lon, lat = regular_grid()
+    rng = np.random.default_rng(0)
+    new_lon = rng.uniform(-12, 12, 500)
+    new_lat = rng.uniform(44, 61, 500)
+    grid_index = general_utils.GridIndex(lon, lat, backend='balltree')
+    assert grid_index.regular
+    curvilinear = general_utils.GridIndex(lon + 0.01*lat, lat, backend='balltree')
+    assert not curvilinear.regular
+    ind_y, ind_x = grid_index.query(new_lon, new_lat)
+    grid_index.build_index()
+    ref_y, ref_x = grid_index.query_index(new_lon, new_lat)
+    assert np.array_equal(ind_y, ref_y) and np.array_equal(ind_x, ref_x)
+
+
+def test_grid_index_regular_anisotropic_polar():
+    # Wide longitude spacing at high latitude: the nearest point can be many
+    # rows poleward of the query's latitude
+    rng = np.random.default_rng(0)
+    new_lon = rng.uniform(-180, 135, 2000)
+    new_lat = rng.uniform(70, 90, 2000)
+    for dlat in [0.25, 0.1]:
+        lon, lat = np.meshgrid(np.arange(-180, 180, 45.), np.arange(70, 90 + dlat/2, dlat))
+        grid_index = general_utils.GridIndex(lon, lat, backend='balltree')
+        assert grid_index.regular
+        ind_y, ind_x = grid_index.query(new_lon, new_lat)
+        grid_index.build_index()
+        ref_y, ref_x = grid_index.query_index(new_lon, new_lat)
+        # Compare distances: the points of the 90N row coincide
+        distance = general_utils.calculate_haversine_distance(new_lon, new_lat, lon[ind_y, ind_x], lat[ind_y, ind_x])
+        ref_distance = general_utils.calculate_haversine_distance(new_lon, new_lat, lon[ref_y, ref_x], lat[ref_y, ref_x])
+        assert np.allclose(distance, ref_distance, rtol=0, atol=1e-6)
+
+
+def test_subset_indices_by_distance_BT_reuses_grid_index():
+    lon, lat = regular_grid()
+    general_utils.subset_indices_by_distance_BT(lon, lat, 0, 50, 60)
+    grid_index = general_utils.get_grid_index(lon, lat, backend='balltree')
+    assert grid_index.index is not None
+    assert grid_index.locs.shape == (lon.size, 2)
+
+
+def test_subset_indices_by_distance_BT_threaded():
+    lon, lat = regular_grid()
+    centre_lon = np.linspace(-8, 8, 7)
+    centre_lat = np.linspace(46, 58, 7)
+    ind_x, ind_y = general_utils.subset_indices_by_distance_BT(
+        lon, lat, centre_lon, centre_lat, 100, chunk_size=2, n_jobs=1)
+    ind_x_t, ind_y_t = general_utils.subset_indices_by_distance_BT(
+        lon, lat, centre_lon, centre_lat, 100, chunk_size=2, n_jobs=2)
+    for ii in range(7):
+        assert np.array_equal(ind_x[ii], ind_x_t[ii])
+        assert np.array_equal(ind_y[ii], ind_y_t[ii])
@@ -0,0 +1,64 @@
+# Test with PyTest
+# NEMO loading tests on the example files (section 1 of
+# unit_testing/unit_test.py). NEMO objects and the opened domain file are
+# session fixtures, so each is built once however many tests use it.
+
+import os.path as path
+import pytest
+import xarray as xr
+import coast
+
+dn_files = path.join(path.dirname(__file__), '..', 'example_files')
+fn_nemo_dat = 'COAsT_example_NEMO_data.nc'
+fn_nemo_dom = 'COAsT_example_NEMO_domain.nc'
+fn_nemo_grid_t_dat = 'nemo_data_T_grid.nc'
+fn_nemo_grid_u_dat = 'nemo_data_U_grid.nc'
+fn_nemo_grid_v_dat = 'nemo_data_V_grid.nc'
+
+pytestmark = pytest.mark.skipif(not path.isdir(dn_files),
+                                reason='example_files not downloaded')
+
+
+@pytest.fixture(scope='session')
+def nemo_dom():
+    return xr.open_dataset(path.join(dn_files, fn_nemo_dom))
+
+
+@pytest.fixture(scope='session')
+def sci(nemo_dom):
+    return coast.NEMO(path.join(dn_files, fn_nemo_dat), nemo_dom,
+                      grid_ref='t-grid')
+
+
+def test_load_nemo(sci):
+    attrs_ref = {'name': 'AMM7_1d_20070101_20070131_25hourm_grid_T',
+                 'description': 'ocean T grid variables, 25h meaned',
+                 'title': 'ocean T grid variables, 25h meaned',
+                 'Conventions': 'CF-1.6',
+                 'timeStamp': '2019-Dec-26 04:35:28 GMT',
+                 'uuid': '96cae459-d3a1-4f4f-b82b-9259179f95f7'}
+    assert attrs_ref.items() <= sci.dataset.attrs.items()
+
+
+def test_variable_and_dimension_names(sci):
+    assert 'temperature' in sci.dataset
+    assert sci.dataset.temperature.dims == ('t_dim', 'z_dim', 'y_dim', 'x_dim')
+
+
+def test_load_domain_only(nemo_dom):
+    nemo_f = coast.NEMO(fn_domain=nemo_dom, grid_ref='f-grid')
+    assert nemo_f.dataset._coord_names == {'depth_0', 'latitude', 'longitude'}
+    assert set(nemo_f.dataset.data_vars) == {'bathymetry', 'e1', 'e2', 'e3_0'}
+
+
+@pytest.mark.parametrize('grid_ref, fn_data, expected', [
+    ('t-grid', fn_nemo_grid_t_dat, 1705804300.0),
+    ('u-grid', fn_nemo_grid_u_dat, 1705317600.0),
+    ('v-grid', fn_nemo_grid_v_dat, 1705419100.0),
+    ('f-grid', None, 1704932600.0)])
+def test_depth_0(nemo_dom, grid_ref, fn_data, expected):
+    if fn_data is not None:
+        fn_data = path.join(dn_files, fn_data)
+    nemo = coast.NEMO(fn_data=fn_data, fn_domain=nemo_dom, grid_ref=grid_ref)
+    depth_0_sum = float(nemo.dataset.depth_0.sum(skipna=True))
+    assert depth_0_sum == pytest.approx(expected, rel=1e-5)
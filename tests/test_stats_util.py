@@ -0,0 +1,53 @@
+# Test with PyTest
+
+import numpy as np
+import xarray as xr
+import scipy.interpolate
+import coast.stats_util as stats_util
+
+
+def test_doodson_x0_filter():
+    rng = np.random.default_rng(0)
+    elevation = rng.random((200, 3))
+    kern = np.array([1, 0, 1, 0, 0, 1, 0, 1, 1, 0, 2, 0, 1, 1, 0, 2, 1, 1, 2,
+                     0,
+                     2, 1, 1, 2, 0, 1, 1, 0, 2, 0, 1, 1, 0, 1, 0, 0, 1, 0, 1])/30
+    filtered = stats_util.doodson_x0_filter(elevation, ax=0)
+    reference = np.convolve(elevation[:, 1], kern, mode='same')
+    assert filtered.shape == elevation.shape
+    assert np.all(np.isnan(filtered[:19])) and np.all(np.isnan(filtered[-19:]))
+    assert np.allclose(filtered[19:-19, 1], reference[19:-19])
+
+
+def test_doodson_x0_filter_dataarray_dask():
+    rng = np.random.default_rng(0)
+    elevation = rng.random((200, 3))
+    data_array = xr.DataArray(elevation, dims=('t_dim', 'x_dim'),
+                              attrs={'long_name': 'sea surface height',
+                                     'standard_name': 'sea_surface_height',
+                                     'units': 'm'}).chunk({'t_dim': 50})
+    filtered = stats_util.doodson_x0_filter_dataarray(data_array, dim='t_dim')
+    reference = stats_util.doodson_x0_filter(elevation, ax=0)
+    assert filtered.dims == data_array.dims
+    assert filtered.attrs == {'long_name': 'sea surface height (Doodson X0 filtered)',
+                              'units': 'm'}
+    assert data_array.attrs['long_name'] == 'sea surface height'
+    assert filtered.chunks is not None
+    assert np.allclose(filtered.values, reference, equal_nan=True)
+
+
+def test_quadratic_spline_roots():
+    x = np.linspace(0, 4*np.pi, 200)
+    spl = scipy.interpolate.InterpolatedUnivariateSpline(x, np.sin(x), k=3)
+    roots = stats_util.quadratic_spline_roots(spl.derivative())
+    assert np.allclose(roots, [np.pi/2, 3*np.pi/2, 5*np.pi/2, 7*np.pi/2], atol=1e-3)
+
+
+def test_find_maxima_comp():
+    time = np.arange('2007-01-15T00', '2007-01-17T00', dtype='datetime64[h]')
+    y = xr.DataArray(np.sin(2*np.pi*np.arange(len(time))/12.), dims='t_dim',
+                     coords={'time': ('t_dim', time)}).chunk(10)
+    time_max, values_max = stats_util.find_maxima(y.time, y, method='comp')
+    assert time_max.dims == ('t_dim',)
+    assert time_max.values[0] == np.datetime64('2007-01-15T03')
+    assert np.allclose(values_max, 1)
@@ -13,6 +13,8 @@ subsection, subsec should be incremented by one.
 There are two accompaniment files to this unit testing script:
     - unit_test_contents: A list of sections and subsections.
     - unit_test_guidelines: Further guidelines to creating unit tests.
+The NEMO loading tests of section 1 are also in tests/test_nemo.py, as pytest
+tests sharing session-scoped fixtures.
 Run:
 ipython: cd COAsT; run unit_testing/unit_test.py  # I.e. from the git repo.
 Unit template:
@@ -30,17 +32,21 @@ try:
         print(str(sec) + chr(subsec) + " OK - ")
     else:
         print(str(sec) + chr(subsec) + " X - ")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 """
 
+import matplotlib
+matplotlib.use('Agg') # Figures are only saved to file. Must precede coast/pyplot
 import coast
 import os
 import numpy as np
 import xarray as xr
 import matplotlib.pyplot as plt
+plt.rcParams['figure.max_open_warning'] = 0
 import datetime
-import os.path as path
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import coast.general_utils as general_utils
 import coast.plot_util as plot_util
@@ -87,6 +93,29 @@ fn_EN4 = dn_files + 'EN4_example.nc'
 fn_nemo_harmonics = "coast_nemo_harmonics.nc"
 fn_nemo_harmonics_dom    = "coast_nemo_harmonics_dom.nc"
 
+# Data files are chunked one time step at a time, so that tests reading
+# attributes or a single slice do not read whole variables. Other dimensions
+# (and domain files, which have no time_counter) are single chunks.
+chunks = {'time_counter': 1}
+
+@functools.lru_cache(maxsize=None)
+def _open(fn):
+    ''' Opens a file in dn_files once. NEMO objects accept the opened dataset
+    in place of a file name, so the many NEMO objects built from the same
+    example files below share one decode of each file. '''
+    return xr.open_dataset(dn_files + fn, chunks=chunks)
+
+def _sum_close(da, expected, rtol=1e-5):
+    ''' True if the (nan skipping) sum of DataArray da is within rtol of
+    expected. Uses a relative tolerance only: np.isclose's absolute tolerance
+    is meaningless for checksums of order 1e9. '''
+    try:
+        xr.testing.assert_allclose(da.sum(skipna=True).reset_coords(drop=True),
+                                   xr.DataArray(expected), rtol=rtol)
+    except AssertionError:
+        return False
+    return True
+
 sec = 1
 subsec = 96 # Code for '`' (1 below 'a')
 '''
@@ -103,8 +132,7 @@ subsec = 96 # Code for '`' (1 below 'a')
 subsec = subsec+1
 
 try:
-    sci = coast.NEMO(path.join(dn_files, fn_nemo_dat),
-                     path.join(dn_files, fn_nemo_dom), grid_ref = 't-grid')
+    sci = coast.NEMO(_open(fn_nemo_dat), _open(fn_nemo_dom), grid_ref = 't-grid')
 
     # Test the data has loaded
     sci_attrs_ref = dict([('name', 'AMM7_1d_20070101_20070131_25hourm_grid_T'),
@@ -119,7 +147,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - NEMO data loaded: " + fn_nemo_dat)
     else:
         print(str(sec) + chr(subsec) + " X - There is an issue with loading " + fn_nemo_dat)
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 #-----------------------------------------------------------------------------#
@@ -128,16 +156,23 @@ except:
 
 subsec = subsec+1
 try:
-    ds = xr.open_dataset(dn_files + fn_nemo_dat)
+    ds = _open(fn_nemo_dat)
     sci_load_ds = coast.NEMO()
     sci_load_ds.load_dataset(ds)
     sci_load_file = coast.NEMO()
-    sci_load_file.load(dn_files + fn_nemo_dat)
-    if sci_load_ds.dataset.identical(sci_load_file.dataset):
+    sci_load_file.load(dn_files + fn_nemo_dat, chunks=chunks)
+    # Compare structure (variables, shapes, dtypes, attributes) rather than
+    # values, which would read both copies of the file in full
+    ds_a, ds_b = sci_load_ds.dataset, sci_load_file.dataset
+    same_structure = set(ds_a.data_vars) == set(ds_b.data_vars) \
+                 and ds_a.attrs == ds_b.attrs \
+                 and all(ds_a[v].shape == ds_b[v].shape and ds_a[v].dtype == ds_b[v].dtype
+                         for v in ds_a.data_vars)
+    if same_structure:
         print(str(sec) + chr(subsec) + " OK - COAsT.load_dataset()")
     else:
-        print(str(sec) + chr(subsec) + " X - COAsT.load_dataset() ERROR - not identical to dataset loaded via COAsT.load()")
-except:
+        print(str(sec) + chr(subsec) + " X - COAsT.load_dataset() ERROR - does not match dataset loaded via COAsT.load()")
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 #-----------------------------------------------------------------------------#
@@ -146,14 +181,14 @@ except:
 
 subsec = subsec+1
 try:
-    sci = coast.NEMO(dn_files + fn_nemo_dat, dn_files + fn_nemo_dom, grid_ref='t-grid')
+    sci = coast.NEMO(_open(fn_nemo_dat), _open(fn_nemo_dom), grid_ref='t-grid')
     try:
         sci.dataset.temperature
-    except NameError:
+    except AttributeError:
         print(str(sec) + chr(subsec) + " X - variable name (to temperature) not reset")
     else:
         print(str(sec) + chr(subsec) + " OK - variable name reset (to temperature)")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 #-----------------------------------------------------------------------------#
@@ -166,7 +201,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - dimension names reset")
     else:
         print(str(sec) + chr(subsec) + " X - dimension names not reset")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 #-----------------------------------------------------------------------------#
@@ -175,15 +210,10 @@ except:
 
 subsec = subsec+1
 
-pass_test = False
-nemo_f = coast.NEMO( fn_domain=dn_files+fn_nemo_dom, grid_ref='f-grid' )
+nemo_f = coast.NEMO( fn_domain=_open(fn_nemo_dom), grid_ref='f-grid' )
 
-if nemo_f.dataset._coord_names == {'depth_0', 'latitude', 'longitude'}:
-    var_name_list = []
-    for var_name in nemo_f.dataset.data_vars:
-        var_name_list.append(var_name)
-    if var_name_list == ['bathymetry', 'e1', 'e2', 'e3_0']:
-        pass_test = True
+pass_test = (nemo_f.dataset._coord_names == {'depth_0', 'latitude', 'longitude'}
+             and set(nemo_f.dataset.data_vars) == {'bathymetry', 'e1', 'e2', 'e3_0'})
 
 if pass_test:
     print(str(sec) + chr(subsec) + " OK - NEMO loaded domain data only")
@@ -196,21 +226,30 @@ else:
 
 subsec = subsec+1
 
+# The domain and each grid file are only decoded once (see _open()). The grid
+# files are not merged into one dataset: each has its own depth coordinate
+# (deptht, depthu, depthv) that NEMO renames to z_dim. The four NEMO objects
+# are independent, so they are constructed in threads to overlap the reads.
 try:
-    nemo_t = coast.NEMO( fn_data=dn_files+fn_nemo_grid_t_dat,
-             fn_domain=dn_files+fn_nemo_dom, grid_ref='t-grid' )
-    if not np.isclose(np.nansum(nemo_t.dataset.depth_0.values), 1705804300.0):
+    grid_files = {'t-grid': _open(fn_nemo_grid_t_dat),
+                  'u-grid': _open(fn_nemo_grid_u_dat),
+                  'v-grid': _open(fn_nemo_grid_v_dat),
+                  'f-grid': None}
+    with ThreadPoolExecutor(len(grid_files)) as executor:
+        futures = {grid_ref: executor.submit(coast.NEMO, fn_data=fn_data,
+                                             fn_domain=_open(fn_nemo_dom),
+                                             grid_ref=grid_ref)
+                   for grid_ref, fn_data in grid_files.items()}
+    nemo_t, nemo_u, nemo_v, nemo_f = [futures[grid_ref].result()
+                                      for grid_ref in grid_files]
+
+    if not _sum_close(nemo_t.dataset.depth_0, 1705804300.0):
         raise ValueError(" X - NEMO depth_0 failed on t-grid failed")
-    nemo_u = coast.NEMO( fn_data=dn_files+fn_nemo_grid_u_dat,
-             fn_domain=dn_files+fn_nemo_dom, grid_ref='u-grid' )
-    if not np.isclose(np.nansum(nemo_u.dataset.depth_0.values), 1705317600.0):
+    if not _sum_close(nemo_u.dataset.depth_0, 1705317600.0):
         raise ValueError(" X - NEMO depth_0 failed on u-grid failed")
-    nemo_v = coast.NEMO( fn_data=dn_files+fn_nemo_grid_v_dat,
-             fn_domain=dn_files+fn_nemo_dom, grid_ref='v-grid' )
-    if not np.isclose(np.nansum(nemo_v.dataset.depth_0.values), 1705419100.0):
+    if not _sum_close(nemo_v.dataset.depth_0, 1705419100.0):
         raise ValueError(" X - NEMO depth_0 failed on v-grid failed")
-    nemo_f = coast.NEMO( fn_domain=dn_files+fn_nemo_dom, grid_ref='f-grid' )
-    if not np.isclose(np.nansum(nemo_f.dataset.depth_0.values), 1704932600.0):
+    if not _sum_close(nemo_f.dataset.depth_0, 1704932600.0):
         raise ValueError(" X - NEMO depth_0 failed on f-grid failed")
 
     print(str(sec) + chr(subsec) + " OK - NEMO depth_0 calculations correct")
@@ -226,7 +265,7 @@ subsec = subsec+1
 try:
 
     amm7 = coast.NEMO(dn_files + fn_nemo_dat_subset,
-                     dn_files + fn_nemo_dom)
+                     _open(fn_nemo_dom), chunks=chunks)
 
     # checking all the coordinates mapped correctly to the dataset object
     if amm7.dataset._coord_names == {'depth_0', 'latitude', 'longitude', 'time'}:
@@ -236,7 +275,7 @@ try:
         print(str(sec) + chr(subsec) + ' X - There is an issue with ', \
               'loading and subsetting the data ' + fn_nemo_dat_subset)
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED. Test data in: {}.'\
           .format(fn_nemo_dat_subset) )
 
@@ -250,7 +289,8 @@ subsec = subsec+1
 try:
     file_names_amm7 = "nemo_data_T_grid*.nc"
     amm7 = coast.NEMO(dn_files + file_names_amm7,
-                dn_files + fn_nemo_dom, grid_ref='t-grid', multiple=True)
+                _open(fn_nemo_dom), grid_ref='t-grid', multiple=True,
+                chunks=chunks)
 
     # checking all the coordinates mapped correctly to the dataset object
     if amm7.dataset.time.size == 14:
@@ -260,7 +300,7 @@ try:
         print(str(sec) + chr(subsec) + ' X - There is an issue with loading',\
               'multiple data files ' + file_names_amm7)
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED. Test data in: {} on {}.'\
           .format(dn_files, file_names_amm7) )
 
@@ -281,13 +321,14 @@ try:
 
     #TEST: Check values in arrays and constituents
     check1 = list(harmonics_combined.dataset.constituent.values) == constituents
-    check2 = harmonics_combined.dataset.harmonic_x[1].values == harmonics.dataset.M2x.values
-    if check1 and check2.all():
+    check2 = np.array_equal(harmonics_combined.dataset.harmonic_x[1],
+                            harmonics.dataset.M2x)
+    if check1 and check2:
         print(str(sec) + chr(subsec) + " OK - Harmonics loaded and combined")
     else:
         print(str(sec) + chr(subsec) + " X - Problem combining harmonics")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -304,14 +345,14 @@ try:
 
     #TEST: Check variables and differences
     check1 = 'x_test' in harmonics_combined.dataset.keys()
-    diff = harmonics_combined.dataset.harmonic_x[0].values - harmonics_combined.dataset.x_test[0].values
-    check2 = np.max(np.abs(diff)) < 1e-6
+    check2 = np.allclose(harmonics_combined.dataset.harmonic_x[0],
+                         harmonics_combined.dataset.x_test[0], rtol=0, atol=1e-6)
     if check1 and check2:
         print(str(sec) + chr(subsec) + " OK - Harmonics converted")
     else:
         print(str(sec) + chr(subsec) + " X - Problem converting harmonics")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -319,20 +360,20 @@ except:
 #
 subsec = subsec+1
 try:
-    nemo_t = coast.NEMO( fn_data=dn_files+fn_nemo_grid_t_dat,
-                        fn_domain=dn_files+fn_nemo_dom, grid_ref='t-grid' )
+    nemo_t = coast.NEMO( fn_data=_open(fn_nemo_grid_t_dat),
+                        fn_domain=_open(fn_nemo_dom), grid_ref='t-grid' )
     
     e3t,e3u,e3v,e3f,e3w = coast.NEMO.get_e3_from_ssh(nemo_t,True,True,True,True,True)
-    cksum = np.array([e3t.sum(),e3u.sum(),e3v.sum(),
-                      e3f.sum(),e3w.sum()])
+    cksum = np.array([float(e3.sum()) for e3 in (e3t, e3u, e3v, e3f, e3w)],
+                     dtype=np.float64)
     # these references are based on the example file's ssh field
     reference = np.array([8.337016e+08, 8.333972e+08, 8.344886e+08,
-                          8.330722e+08, 8.265948e+08])
+                          8.330722e+08, 8.265948e+08], dtype=np.float64)
     if np.allclose(cksum, reference):
         print(str(sec) + chr(subsec) + " OK - computed e3[t,u,v,f,w] as expected")
     else:
         print(str(sec) + chr(subsec) + " X - computed e3[t,u,v,f,w] not as expected")        
-except:
+except Exception:
     print(str(sec) + chr(subsec) + ' FAILED.\n' + traceback.format_exc())
 
 '''
@@ -351,11 +392,14 @@ subsec = subsec+1
 
 try:
     sci_copy = sci.copy()
-    if sci_copy.dataset == sci.dataset:
+    # Dataset == Dataset compares every element and the truth value of the
+    # resulting Dataset is just whether it has variables. equals() returns a
+    # single bool, and is cheap here as COAsT.copy() is shallow.
+    if sci_copy is not sci and sci_copy.dataset.equals(sci.dataset):
         print(str(sec) +chr(subsec) + " OK - Copied COAsT object ")
     else:
         print(str(sec) +chr(subsec) + " X - Copy Failed ")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 #-----------------------------------------------------------------------------#
@@ -369,7 +413,7 @@ try:
         print(str(sec) +chr(subsec) + " OK - COAsT.__getitem__ works correctly ")
     else:
         print(str(sec) +chr(subsec) + " X - Problem with COAsT.__getitem__ ")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 #-----------------------------------------------------------------------------#
@@ -383,7 +427,7 @@ try:
         print(str(sec) +chr(subsec) + " OK - Renaming of variable in dataset ")
     else:
         print(str(sec) +chr(subsec) + " X - Variable renaming failed ")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 #-----------------------------------------------------------------------------#
@@ -399,7 +443,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - day of the week method")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED: day of the week method')
 
 '''
@@ -417,9 +461,9 @@ subsec = 96
 subsec = subsec+1
 
 # Initialise DataArrays
-nemo_t = coast.NEMO( fn_data=dn_files+fn_nemo_grid_t_dat,
-         fn_domain=dn_files+fn_nemo_dom, grid_ref='t-grid' )
-nemo_w = coast.NEMO( fn_domain=dn_files+fn_nemo_dom, grid_ref='w-grid' )
+nemo_t = coast.NEMO( fn_data=_open(fn_nemo_grid_t_dat),
+         fn_domain=_open(fn_nemo_dom), grid_ref='t-grid' )
+nemo_w = coast.NEMO( fn_domain=_open(fn_nemo_dom), grid_ref='w-grid' )
 
 try:
     log_str = ""
@@ -456,7 +500,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - NEMO.differentiate method failed: " + log_str)
 
-except:
+except Exception:
     print(str(sec) +chr(subsec) + " X - setting derivative attributes failed ")
 
 
@@ -465,15 +509,14 @@ except:
 #                                                                             #
 
 subsec = subsec+1
-nemo_t = coast.NEMO( fn_data=dn_files+fn_nemo_grid_t_dat,
-                    fn_domain=dn_files+fn_nemo_dom, grid_ref='t-grid' )
+nemo_t = coast.NEMO( fn_data=_open(fn_nemo_grid_t_dat),
+                    fn_domain=_open(fn_nemo_dom), grid_ref='t-grid' )
 nemo_t.construct_density()
 yt, xt, length_of_line = nemo_t.transect_indices([54,-15],[56,-12])
 
 try:
-    if not np.allclose( nemo_t.dataset.density.sel(x_dim=xr.DataArray(xt,dims=['r_dim']),
-                        y_dim=xr.DataArray(yt,dims=['r_dim'])).sum(
-                        dim=['t_dim','r_dim','z_dim']).item(),
+    if not _sum_close( nemo_t.dataset.density.sel(x_dim=xr.DataArray(xt,dims=['r_dim']),
+                        y_dim=xr.DataArray(yt,dims=['r_dim'])),
                         11185010.518671108 ):
         raise ValueError(str(sec) + chr(subsec) + ' X - Density incorrect')
     print(str(sec) + chr(subsec) + ' OK - Density correct')
@@ -490,9 +533,9 @@ subsec = subsec+1
 
 nemo_t = None; nemo_w = None
 nemo_t = coast.NEMO(dn_files + fn_nemo_grid_t_dat_summer,
-                    dn_files + fn_nemo_dom, grid_ref='t-grid')
+                    _open(fn_nemo_dom), grid_ref='t-grid', chunks=chunks)
 # create an empty w-grid object, to store stratification
-nemo_w = coast.NEMO( fn_domain = dn_files + fn_nemo_dom, grid_ref='w-grid')
+nemo_w = coast.NEMO( fn_domain = _open(fn_nemo_dom), grid_ref='w-grid')
 try:
     log_str = ""
     # initialise Internal Tide object
@@ -519,14 +562,14 @@ try:
         log_str += 'Missing mask variable\n'
 
     # Check the calculations are as expected
-    if np.isclose(IT.dataset.strat_1st_mom.sum(), 3.74214231e+08)  \
-        and np.isclose(IT.dataset.strat_2nd_mom.sum(), 2.44203298e+08) \
-        and np.isclose(IT.dataset.mask.sum(), 450580) \
-        and np.isclose(IT.dataset.strat_1st_mom_masked.sum(), 3.71876949e+08) \
-        and np.isclose(IT.dataset.strat_2nd_mom_masked.sum(), 2.42926865e+08):
+    if _sum_close(IT.dataset.strat_1st_mom, 3.74214231e+08)  \
+        and _sum_close(IT.dataset.strat_2nd_mom, 2.44203298e+08) \
+        and _sum_close(IT.dataset.mask, 450580) \
+        and _sum_close(IT.dataset.strat_1st_mom_masked, 3.71876949e+08) \
+        and _sum_close(IT.dataset.strat_2nd_mom_masked, 2.42926865e+08):
             print(str(sec) + chr(subsec) + " OK - pyncocline depth and thickness good")
 
-except:
+except Exception:
     print(str(sec) +chr(subsec) + " X - computing pycnocline depth and thickness failed ")
 
 
@@ -539,8 +582,9 @@ try:
     fig,ax = IT.quick_plot( 'strat_1st_mom_masked' )
     fig.tight_layout()
     fig.savefig(dn_fig + 'strat_1st_mom.png')
+    plt.close(fig)
     print(str(sec) + chr(subsec) + " OK - pycnocline depth plot saved")
-except:
+except Exception:
     print(str(sec) + chr(subsec) + "X - quickplot() failed")
 
 '''
@@ -558,21 +602,22 @@ subsec = 96
 subsec = subsec+1
 
 # Extract transect indices
-nemo_t = coast.NEMO( fn_data=dn_files+fn_nemo_grid_t_dat,
-                    fn_domain=dn_files+fn_nemo_dom, grid_ref='t-grid' )
+nemo_t = coast.NEMO( fn_data=_open(fn_nemo_grid_t_dat),
+                    fn_domain=_open(fn_nemo_dom), grid_ref='t-grid' )
 yt, xt, length_of_line = nemo_t.transect_indices([51,-5],[49,-9])
 
 # Test transect indices
-yt_ref = [164, 163, 162, 162, 161, 160, 159, 158, 157, 156, 156, 155, 154,
+yt_ref = np.array([164, 163, 162, 162, 161, 160, 159, 158, 157, 156, 156, 155, 154,
        153, 152, 152, 151, 150, 149, 148, 147, 146, 146, 145, 144, 143,
-       142, 142, 141, 140, 139, 138, 137, 136, 136, 135, 134]
-xt_ref = [134, 133, 132, 131, 130, 129, 128, 127, 126, 125, 124, 123, 122,
+       142, 142, 141, 140, 139, 138, 137, 136, 136, 135, 134])
+xt_ref = np.array([134, 133, 132, 131, 130, 129, 128, 127, 126, 125, 124, 123, 122,
        121, 120, 119, 118, 117, 116, 115, 114, 113, 112, 111, 110, 109,
-       108, 107, 106, 105, 104, 103, 102, 101, 100,  99,  98]
+       108, 107, 106, 105, 104, 103, 102, 101, 100,  99,  98])
 length_ref = 37
 
 
-if (xt == xt_ref) and (yt == yt_ref) and (length_of_line == length_ref):
+if np.array_equal(xt, xt_ref) and np.array_equal(yt, yt_ref) \
+                              and (length_of_line == length_ref):
     print(str(sec) + chr(subsec) + " OK - NEMO transect indices extracted")
 else:
     print(str(sec) + chr(subsec) + " X - Issue with transect indices extraction from NEMO")
@@ -582,13 +627,13 @@ else:
 #
 subsec = subsec+1
 try:
-    nemo_t = coast.NEMO( fn_data=dn_files+fn_nemo_grid_t_dat,
-                        fn_domain=dn_files+fn_nemo_dom, grid_ref='t-grid' )
-    nemo_u = coast.NEMO( fn_data=dn_files+fn_nemo_grid_u_dat,
-                        fn_domain=dn_files+fn_nemo_dom, grid_ref='u-grid' )
-    nemo_v = coast.NEMO( fn_data=dn_files+fn_nemo_grid_v_dat,
-                        fn_domain=dn_files+fn_nemo_dom, grid_ref='v-grid' )
-    nemo_f = coast.NEMO( fn_domain=dn_files+fn_nemo_dom, grid_ref='f-grid' )
+    nemo_t = coast.NEMO( fn_data=_open(fn_nemo_grid_t_dat),
+                        fn_domain=_open(fn_nemo_dom), grid_ref='t-grid' )
+    nemo_u = coast.NEMO( fn_data=_open(fn_nemo_grid_u_dat),
+                        fn_domain=_open(fn_nemo_dom), grid_ref='u-grid' )
+    nemo_v = coast.NEMO( fn_data=_open(fn_nemo_grid_v_dat),
+                        fn_domain=_open(fn_nemo_dom), grid_ref='v-grid' )
+    nemo_f = coast.NEMO( fn_domain=_open(fn_nemo_dom), grid_ref='f-grid' )
 
     tran_f = coast.Transect_f( nemo_f, (54,-15), (56,-12) )
     tran_f.calc_flow_across_transect(nemo_u,nemo_v)
@@ -598,7 +643,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - TRANSECT cross flow calculations as expected")
     else:
         print(str(sec) + chr(subsec) + " X - TRANSECT cross flow calculations not as expected")
-except:
+except Exception:
     print(str(sec) + chr(subsec) + ' FAILED.\n' + traceback.format_exc())
 
 #-----------------------------------------------------------------------------#
@@ -611,17 +656,20 @@ try:
     ax.set_ylim([45,65]) #   But can not call plt.show() before adjustments are made...
     #fig.tight_layout()
     fig.savefig(dn_fig + 'transect_map.png')
+    plt.close(fig)
 
     plot_dict = {'fig_size':(5,3), 'title':'Normal velocities'}
     fig,ax = tran_f.plot_normal_velocity(time=0,cmap="seismic",plot_info=plot_dict,smoothing_window=2)
     fig.tight_layout()
     fig.savefig(dn_fig + 'transect_velocities.png')
+    plt.close(fig)
     plot_dict = {'fig_size':(5,3), 'title':'Transport across AB'}
     fig,ax = tran_f.plot_depth_integrated_transport(time=0, plot_info=plot_dict, smoothing_window=2)
     fig.tight_layout()
     fig.savefig(dn_fig + 'transect_transport.png')
+    plt.close(fig)
     print(str(sec) + chr(subsec) + " OK - TRANSECT velocity and transport plots saved")
-except:
+except Exception:
     print(str(sec) + chr(subsec) + ' FAILED.\n' + traceback.format_exc())
 
 #-----------------------------------------------------------------------------#
@@ -640,7 +688,7 @@ try:
     else:
         print(str(sec) + chr(subsec) +
               ' X - TRANSECT density and pressure calculations not as expected')
-except:
+except Exception:
     print(str(sec) + chr(subsec) + ' FAILED.\n' + traceback.format_exc())
 
 #-----------------------------------------------------------------------------#
@@ -665,7 +713,7 @@ try:
     else:
         print(str(sec) + chr(subsec) +
               " X - TRANSECT geostrophic flow calculations now as expected")
-except:
+except Exception:
     print(str(sec) + chr(subsec) + ' FAILED.\n' + traceback.format_exc())
 '''
 #################################################
@@ -683,14 +731,17 @@ try:
     # Extact the variable
     data_t =  sci.get_subset_as_xarray("temperature", xt_ref, yt_ref)
 
-    # Test shape and exteme values
-    if (np.shape(data_t) == (51, 37)) and (np.nanmin(data_t) - 11.267578 < 1E-6) \
-                                      and (np.nanmax(data_t) - 11.834961 < 1E-6):
+    # Test shape and exteme values. Reduce with xarray rather than np.nanmin/
+    # np.nanmax, which would each convert the whole subset to a numpy array
+    data_t_min = float(data_t.min(skipna=True))
+    data_t_max = float(data_t.max(skipna=True))
+    if (data_t.shape == (51, 37)) and (data_t_min - 11.267578 < 1E-6) \
+                                  and (data_t_max - 11.834961 < 1E-6):
         print(str(sec) + chr(subsec) + " OK - NEMO COAsT get_subset_as_xarray extracted expected array size and "
               + "extreme values")
     else:
         print(str(sec) + chr(subsec) + " X - Issue with NEMO COAsT get_subset_as_xarray method")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 #-----------------------------------------------------------------------------#
@@ -712,7 +763,7 @@ try:
 
         print(str(sec) + chr(subsec) + "X - Issue with indices extraction from NEMO domain " \
               + "subset_indices_by_distance method")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 
@@ -733,7 +784,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - nearest_xy_indices works ")
     else:
         print(str(sec) + chr(subsec) + "X - Problem with nearest_xy_indices()")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 #-----------------------------------------------------------------------------#
@@ -752,7 +803,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - Space interpolation works ")
     else:
         print(str(sec) + chr(subsec) + "X - Problem with space interpolation")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 #-----------------------------------------------------------------------------#
@@ -769,7 +820,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - Time interpolation works ")
     else:
         print(str(sec) + chr(subsec) + "X - Problem with time interpolation")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 
@@ -782,7 +833,7 @@ sec = sec+1
 subsec = 96
 # This section is for testing and demonstrating the use of the ALTIMETRY
 # object. First begin by reloading NEMO t-grid test data:
-sci = coast.NEMO(dn_files + fn_nemo_dat, dn_files + fn_nemo_dom, grid_ref = 't-grid')
+sci = coast.NEMO(_open(fn_nemo_dat), _open(fn_nemo_dom), grid_ref = 't-grid')
 
 
 #-----------------------------------------------------------------------------#
@@ -805,7 +856,7 @@ try:
         print(str(sec) +chr(subsec) + " OK - Altimetry data loaded: " + fn_altimetry)
     else:
         print(str(sec) + chr(subsec) + " X - There is an issue with loading: " + fn_altimetry)
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 
@@ -825,7 +876,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - ALTIMETRY object subsetted using isel ")
     else:
         print(str(sec) + chr(subsec) + "X - Failed to subset object/ return as copy")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +" FAILED")
 
 
@@ -846,9 +897,9 @@ try:
             print(str(sec) + chr(subsec) + " OK - model SSH interpolated to altimetry")
         else:
             print(str(sec) + chr(subsec) + " OK - X - Interpolation to altimetry failed")
-    except:
+    except Exception:
         print(str(sec) + chr(subsec) + " X - Interpolation to altimetry failed")
-except:
+except Exception:
     print(str(sec) + chr(subsec) + " FAILED")
 
 
@@ -873,7 +924,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - Altimetry CRPS")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 
@@ -899,7 +950,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X -  Basic Stats for ALTIMETRY")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 
@@ -914,9 +965,9 @@ plt.close('all')
 try:
     fig, ax = crps.quick_plot('crps')
     fig.savefig(dn_fig + 'altimetry_crps_quick_plot.png')
-    #plt.close(fig)
+    plt.close(fig)
     print(str(sec) + chr(subsec) + " OK - Altimetry quick plot saved")
-except:
+except Exception:
     print(str(sec) + chr(subsec) + " X - Altimetry quick plot not saved")
 
 plt.close('all')
@@ -931,7 +982,7 @@ subsec = 96
 
 # This section is for testing and demonstrating the use of the TIDEGAUGE
 # object. First begin by reloading NEMO t-grid test data:
-sci = coast.NEMO(dn_files + fn_nemo_dat, dn_files + fn_nemo_dom, grid_ref = 't-grid')
+sci = coast.NEMO(_open(fn_nemo_dat), _open(fn_nemo_dom), grid_ref = 't-grid')
 
 
 #-----------------------------------------------------------------------------#
@@ -968,7 +1019,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - Tide gauge loaded")
     else:
         print(str(sec) + chr(subsec) + " X - Failed to load tide gauge")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1008,7 +1059,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - BODC tide gauge loaded")
     else:
         print(str(sec) + chr(subsec) + " X - Failed to load BODC tide gauge")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1046,7 +1097,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - EA Tide gauge loaded")
     else:
         print(str(sec) + chr(subsec) + " X - Failed to load EA tide gauge")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1074,7 +1125,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - Tide gauge obs_operator")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1096,7 +1147,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - Problem with guage/model CRPS")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1119,7 +1170,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X -  Basic Stats for TIDEGAUGE")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1141,7 +1192,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X -  Resample TIDEGAUGE")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1162,7 +1213,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X -  TIDEGAUGE doodson X0")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1186,7 +1237,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - Multiple tide gauge load")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1198,8 +1249,9 @@ subsec = subsec+1
 try:
     f,a = lowestoft.plot_on_map()
     f.savefig(dn_fig + 'tidegauge_map.png')
+    plt.close(f)
     print(str(sec) + chr(subsec) + " OK - Tide gauge map plot saved")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 plt.close('all')
@@ -1213,8 +1265,9 @@ subsec = subsec+1
 try:
     f,a = coast.TIDEGAUGE.plot_on_map_multiple(tidegauge_list)
     f.savefig(dn_fig + 'tidegauge_multiple_map.png')
+    plt.close(f)
     print(str(sec) + chr(subsec) + " OK - Tide gauge multiple map plot saved")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 plt.close('all')
@@ -1229,8 +1282,9 @@ subsec = subsec+1
 try:
     f,a = lowestoft.plot_timeseries(['sea_level', 'sea_level_1H', 'sea_level_1H_dx0'])
     f.savefig(dn_fig + 'tidegauge_timeseries.png')
+    plt.close(f)
     print(str(sec) + chr(subsec) + " OK - Tide gauge time series saved")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 plt.close('all')
@@ -1260,7 +1314,7 @@ try:
         print(str(sec) + chr(subsec) + " OK - Tide table processing")
     else:
         print(str(sec) + chr(subsec) + " X - Tide table processing")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1293,12 +1347,13 @@ try:
     plt.legend(['Time Series','Maxima','Minima'])
     plt.title('Tide Gauge Optima at Lowestoft')
     f.savefig(dn_fig + 'tidegauge_optima.png')
+    plt.close(f)
 
     if check1 and check2 and check3 and check4:
         print(str(sec) + chr(subsec) + " OK - Tidegauge local extrema found")
     else:
         print(str(sec) + chr(subsec) + " X - Tidegauge local extrema")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 
@@ -1335,12 +1390,13 @@ try:
     plt.legend(['Time Series','Maxima','Minima'])
     plt.title('Tide Gauge Optima at Gladstone, fitted cubic spline')
     f.savefig(dn_fig + 'tidegauge_optima.png')
+    plt.close(f)
 
     if check1.all() and check2.all():
         print(str(sec) + chr(subsec) + " OK - Tidegauge cubic extrema found")
     else:
         print(str(sec) + chr(subsec) + " X - Tidegauge cubic extrema")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 
@@ -1355,7 +1411,7 @@ subsec = 96
 #%% ( 8a ) Extract isbath contour between two points and create contour object  #
 #                                                                             #
 subsec = subsec+1
-nemo_f = coast.NEMO( fn_domain=dn_files+fn_nemo_dom, grid_ref='f-grid' )
+nemo_f = coast.NEMO( fn_domain=_open(fn_nemo_dom), grid_ref='f-grid' )
 contours, no_contours = coast.Contour.get_contours(nemo_f, 200)
 y_ind, x_ind, contour = coast.Contour.get_contour_segment(nemo_f, contours[0],
                                                           [50,-10], [60,3])
@@ -1372,6 +1428,7 @@ subsec = subsec+1
 coast.Contour.plot_contour(nemo_f, contour)
 cont_path = dn_fig + 'contour.png'
 plt.savefig(cont_path)
+plt.close()
 try:
     if os.path.isfile(cont_path) and os.path.getsize(cont_path) > 0:
         print(str(sec) + chr(subsec) + " OK - Contour plot saved")
@@ -1383,8 +1440,8 @@ except OSError:
 #%% ( 8c ) Calculate pressure along contour                                     #
 #                                                                             #
 subsec = subsec+1
-nemo_t = coast.NEMO( fn_data=dn_files+fn_nemo_grid_t_dat,
-                    fn_domain=dn_files+fn_nemo_dom, grid_ref='t-grid' )
+nemo_t = coast.NEMO( fn_data=_open(fn_nemo_grid_t_dat),
+                    fn_domain=_open(fn_nemo_dom), grid_ref='t-grid' )
 contours, no_contours = coast.Contour.get_contours(nemo_t, 200)
 y_ind, x_ind, contour = coast.Contour.get_contour_segment(nemo_t, contours[0],
                                                           [50,-10], [60,3])
@@ -1399,11 +1456,11 @@ else:
 #%% ( 8d ) Calculate flow across contour                                        #
 #                                                                             #
 subsec = subsec+1
-nemo_f = coast.NEMO( fn_domain=dn_files+fn_nemo_dom, grid_ref='f-grid' )
-nemo_u = coast.NEMO( fn_data=dn_files+fn_nemo_grid_u_dat,
-                    fn_domain=dn_files+fn_nemo_dom, grid_ref='u-grid' )
-nemo_v = coast.NEMO( fn_data=dn_files+fn_nemo_grid_v_dat,
-                    fn_domain=dn_files+fn_nemo_dom, grid_ref='v-grid' )
+nemo_f = coast.NEMO( fn_domain=_open(fn_nemo_dom), grid_ref='f-grid' )
+nemo_u = coast.NEMO( fn_data=_open(fn_nemo_grid_u_dat),
+                    fn_domain=_open(fn_nemo_dom), grid_ref='u-grid' )
+nemo_v = coast.NEMO( fn_data=_open(fn_nemo_grid_v_dat),
+                    fn_domain=_open(fn_nemo_dom), grid_ref='v-grid' )
 contours, no_contours = coast.Contour.get_contours(nemo_f, 200)
 y_ind, x_ind, contour = coast.Contour.get_contour_segment(nemo_f, contours[0],
                                                           [50,-10], [60,3])
@@ -1442,8 +1499,8 @@ subsec = 96
 #
 subsec = subsec+1
 try:
-    nemo_t = coast.NEMO( fn_data=dn_files+fn_nemo_grid_t_dat,
-                    fn_domain=dn_files+fn_nemo_dom, grid_ref='t-grid' )
+    nemo_t = coast.NEMO( fn_data=_open(fn_nemo_grid_t_dat),
+                    fn_domain=_open(fn_nemo_dom), grid_ref='t-grid' )
     eofs = coast.eofs( nemo_t.dataset.ssh )
 
     ssh_reconstruction = (eofs.EOF * eofs.temporal_proj).sum(dim='mode'). \
@@ -1460,7 +1517,7 @@ try:
             print(str(sec) + chr(subsec) + " X - Variance explained does not sum to 100 %")
     else:
         print(str(sec) + chr(subsec) + " X - Original signal not reconstructed from EOFs")
-except:
+except Exception:
     print(str(sec) + chr(subsec) + ' FAILED.\n' + traceback.format_exc())
 
 #%%---------------------------------------------------------------------------#
@@ -1468,8 +1525,8 @@ except:
 #
 subsec = subsec+1
 try:
-    nemo_t = coast.NEMO( fn_data=dn_files+fn_nemo_grid_t_dat,
-                    fn_domain=dn_files+fn_nemo_dom, grid_ref='t-grid' )
+    nemo_t = coast.NEMO( fn_data=_open(fn_nemo_grid_t_dat),
+                    fn_domain=_open(fn_nemo_dom), grid_ref='t-grid' )
     heofs = coast.hilbert_eofs( nemo_t.dataset.ssh )
 
     ssh_reconstruction = (heofs.EOF_amp * heofs.temporal_amp * \
@@ -1490,7 +1547,7 @@ try:
         print(str(sec) + chr(subsec) + " X - Original signal not reconstructed from HEOFs")
 
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) + ' FAILED.\n' + traceback.format_exc())
     
 '''
@@ -1520,7 +1577,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - Problem with EN4 reading")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 
@@ -1534,8 +1591,9 @@ subsec = subsec+1
 try:
     f,a = profiles.plot_map()
     f.savefig(dn_fig + 'profiles_map.png')
+    plt.close(f)
     print(str(sec) + chr(subsec) + " OK - Profiles map plot saved")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1548,8 +1606,9 @@ subsec = subsec+1
 try:
     f,a = profiles.plot_ts_diagram(10)
     f.savefig(dn_fig + 'profile_ts_diagram.png')
+    plt.close(f)
     print(str(sec) + chr(subsec) + " OK - Profiles ts diagram plot saved")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1562,8 +1621,9 @@ subsec = subsec+1
 try:
     f,a = profiles.plot_profile(var='potential_temperature',profile_indices=[10])
     f.savefig(dn_fig + 'profile_temperature_diagram.png')
+    plt.close(f)
     print(str(sec) + chr(subsec) + " OK - Profiles temperature plot saved")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 #%%
 '''
@@ -1593,7 +1653,7 @@ try:
     
     print(str(sec) + chr(subsec) +' OK. Scatter_with_fit()')
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
     
 #-----------------------------------------------------------------------------#
@@ -1615,7 +1675,7 @@ try:
     
     print(str(sec) + chr(subsec) +' OK. create_geo_axes()')
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
     
 #-----------------------------------------------------------------------------#
@@ -1642,7 +1702,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - ")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #-----------------------------------------------------------------------------#
@@ -1668,7 +1728,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - determine_clim_by_std_dev")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #%%
@@ -1707,7 +1767,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - Problem with stats_util.find_maxima()")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #%%
@@ -1722,7 +1782,7 @@ subsec = 96
 
 # Preparation: Create two arrays to put mask onto, one of zeros and one of ones
 # This allows us to test the additive feature.
-sci = coast.NEMO(dn_files + fn_nemo_dat, dn_files + fn_nemo_dom, grid_ref = 't-grid')
+sci = coast.NEMO(_open(fn_nemo_dat), _open(fn_nemo_dom), grid_ref = 't-grid')
 mask00 = np.zeros((sci.dataset.dims['y_dim'], sci.dataset.dims['x_dim']))
 mask01 = np.ones((sci.dataset.dims['y_dim'], sci.dataset.dims['x_dim']))
 
@@ -1749,7 +1809,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - Problem mask creation by index")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
     
 #-----------------------------------------------------------------------------#
@@ -1779,7 +1839,7 @@ try:
     else:
         print(str(sec) + chr(subsec) + " X - Problem mask creation by lonlat")
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
     
 #%%
@@ -1791,7 +1851,7 @@ except:
 sec = sec+1
 subsec = 96
 
-sci = coast.NEMO(dn_files + fn_nemo_dat, dn_files + fn_nemo_dom, grid_ref = 't-grid')
+sci = coast.NEMO(_open(fn_nemo_dat), _open(fn_nemo_dom), grid_ref = 't-grid')
 ds = sci.dataset[['temperature','ssh']].isel(z_dim=0)
 
 
@@ -1827,7 +1887,7 @@ try:
 
 except AssertionError:
     print(str(sec) + chr(subsec) + " X - Problem with computing climatology when dataset has missing values")
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #%%
@@ -1887,7 +1947,7 @@ try:
     else:
         print(str(sec) + " X - example_scripts failed on",gethostname())
 
-except:
+except Exception:
     print(str(sec) + chr(subsec) +' FAILED.')
 
 #%% Close log file